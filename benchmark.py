@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite for Metro RSS Feed System
+Times each stage of the feed pipeline and the timetable lookups offline,
+stores the results as JSON and compares them against a previous run
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone, timedelta
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+import generate_metro_rss as gen
+import timetable
+import timetable_diff
+from network import discover_lines
+from feed_item import FeedItem, split_source_prefix
+from replay import FIXTURES_DIR, load_body, load_store
+
+# Configuration
+DEFAULT_SIZES = [50, 1000, 10000]
+DEFAULT_REPEAT = 5
+DEFAULT_RESULTS_FILE = "benchmark_results.json"
+DEFAULT_MAX_REGRESSION = 0.25  # Fail when a stage gets 25% slower than the baseline
+NEW_ITEMS_PER_MERGE = 10
+LOOKUP_STEP_MINUTES = 5
+LOOKUP_COUNT = 5
+DEFAULT_MEMORY_ITEMS = 100000
+
+# The no-change path (cache hit in check_for_new_content) must stay cheap to start
+IMPORT_TIME_MODULE = "generate_metro_rss"
+IMPORT_TIME_BUDGET_MS = 200
+LAZY_MODULES = ('bs4', 'lxml', 'xml.dom.minidom', 'xml.etree.ElementTree')
+
+def make_listing_html(count, source_name):
+    """Builds a synthetic notice listing page matching the METRO_SOURCES selectors."""
+    parts = ['<html><head><title>Notices</title></head><body><div class="notice-list">']
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        date_text = (start + timedelta(days=i % 365)).strftime('%Y-%m-%d')
+        parts.append(
+            f'<div class="notice-item">'
+            f'<h4><a href="/site/notices/{i}">{source_name} notice {i} about MRT Line 6 service</a></h4>'
+            f'<p class="excerpt">Service update {i}: trains between Uttara North and Motijheel run on a revised schedule.</p>'
+            f'<span class="date">{date_text}</span>'
+            f'</div>'
+        )
+    parts.append('</div></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+def make_updates(count, prefix):
+    """Builds `count` synthetic FeedItems shaped like fetch_metro_updates output."""
+    now = datetime.now(timezone.utc)
+    return [FeedItem(
+        f"{prefix} update {i}",
+        f"https://example.com/{prefix}/{i}",
+        f"https://example.com/{prefix}/{i}",
+        now - timedelta(minutes=i),
+        f"Synthetic {prefix} update number {i} for benchmarking.",
+        'Benchmark',
+        is_permalink=True
+    ) for i in range(count)]
+
+def load_fixture_pages(fixtures_dir):
+    """Loads recorded listing pages for each source from the replay fixture store.
+    Returns (pages, URLs of sources without a recorded 200 response)."""
+    pages = []
+    missing = []
+    store = load_store(fixtures_dir)
+    for source in gen.METRO_SOURCES:
+        entry = store.get(source['url'])
+        if entry and entry['status'] == 200:
+            host = urlparse(source['url']).netloc
+            pages.append((host, source, load_body(fixtures_dir, entry)))
+        else:
+            missing.append(source['url'])
+    return pages, missing
+
+def summarize_timings(timings):
+    """Returns timing statistics in seconds for a list of measurements."""
+    return {
+        'runs': len(timings),
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings)
+    }
+
+def time_stage(func, repeat):
+    """Runs `func` `repeat` times and returns timing statistics in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return summarize_timings(timings)
+
+def measure_import_time(module, repeat):
+    """Measures `python -X importtime -c 'import module'` in fresh interpreters.
+    Returns (timing statistics, set of modules the import loaded)."""
+    timings = []
+    loaded = set()
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                              capture_output=True, text=True, check=True)
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if not cumulative.strip().isdigit():
+                continue  # Column header
+            name = name.strip()
+            loaded.add(name)
+            if name == module:
+                timings.append(int(cumulative) / 1_000_000)
+    return summarize_timings(timings), loaded
+
+def serve_bytes(body):
+    """Serves `body` from a local HTTP server thread. Returns (server, url)."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/site/notices"
+
+def bench_listing_page(label, source, html, repeat, results):
+    """Benchmarks fetch, HTML parse and item extraction for one listing page.
+    The fetch goes through the generator's session and streamed, size-capped read_body."""
+    max_bytes = source.get('max_bytes', gen.MAX_BODY_BYTES)
+    server, url = serve_bytes(html)
+    try:
+        results[f"fetch[{label}]"] = time_stage(
+            lambda: gen.read_body(gen.get_session().get(url, timeout=30, stream=True), max_bytes), repeat)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    results[f"html_parse[{label}]"] = time_stage(lambda: gen.parse_source_page(html), repeat)
+    soup = gen.parse_source_page(html)
+    results[f"extract[{label}]"] = time_stage(lambda: gen.extract_source_updates(soup, source), repeat)
+
+def bench_feed(size, repeat, workdir, results):
+    """Benchmarks GUID merge and XML render against a synthetic feed of `size` items."""
+    feed_file = os.path.join(workdir, f"feed_{size}.xml")
+    old_items = make_updates(size, 'old')
+    with open(feed_file, 'wb') as f:
+        f.write(gen.build_feed_xml(old_items, feed_file))
+
+    existing_guids = gen.load_existing_feed_guids(feed_file)
+    fetched = make_updates(NEW_ITEMS_PER_MERGE, 'new') + old_items[:NEW_ITEMS_PER_MERGE]
+    results[f"load_guids[n={size}]"] = time_stage(lambda: gen.load_existing_feed_guids(feed_file), repeat)
+    results[f"guid_merge[n={size}]"] = time_stage(
+        lambda: gen.merge_feed_items(fetched, existing_guids, feed_file), repeat)
+    results[f"xml_render[n={size}]"] = time_stage(lambda: gen.build_feed_xml(old_items, feed_file), repeat)
+
+def bench_timetables(repeat, results):
+    """Benchmarks index building, next/first/last lookups and revision diffs over every timetable file."""
+    for line, files in discover_lines().items():
+        bench_line_timetables(line, files, repeat, results)
+
+def bench_line_timetables(line, files, repeat, results):
+    indexes = {}
+    for variant, filename in files.items():
+        label = f"mrt-{line}/{variant}"
+        data = timetable.load_timetable(filename)
+        results[f"timetable_index[{label}]"] = time_stage(lambda: timetable.build_index(data), repeat)
+        index = indexes[variant] = timetable.build_index(data)
+
+        def lookups():
+            for directions in index.values():
+                for minutes in directions.values():
+                    for current in range(0, 24 * 60, LOOKUP_STEP_MINUTES):
+                        timetable.get_next_trains(minutes, current, LOOKUP_COUNT)
+                    timetable.first_train(minutes)
+                    timetable.last_train(minutes)
+
+        results[f"next_train_lookups[{label}]"] = time_stage(lookups, repeat)
+
+    # The variants differ enough to stand in for two revisions of the network
+    base = indexes.get('weekday')
+    for variant, index in indexes.items():
+        if base is not None and variant != 'weekday':
+            results[f"timetable_diff[mrt-{line}/weekday->{variant}]"] = time_stage(
+                lambda: timetable_diff.diff_index(base, index), repeat)
+
+def make_history_fields(count):
+    """Raw (feed title, link, description, epoch) tuples as read back from a feed history."""
+    sources = [source['name'] for source in gen.METRO_SOURCES]
+    start = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp())
+    return [(f"[{sources[i % len(sources)]}] Notice {i} about MRT Line 6 service",
+             f"https://example.com/site/notices/{i}",
+             f"Service update {i}: trains between Uttara North and Motijheel run on a revised schedule.",
+             start + i * 600) for i in range(count)]
+
+def build_dict_items(fields):
+    """The 7-key update dicts the pipeline used before FeedItem, for comparison."""
+    items = []
+    for title, link, description, published in fields:
+        source, _ = split_source_prefix(title)
+        items.append({
+            'title': title,
+            'link': link,
+            'guid': link,
+            'is_permalink': True,
+            'pub_date': datetime.fromtimestamp(published, timezone.utc),
+            'description': description,
+            'source': source
+        })
+    return items
+
+def build_slotted_items(fields):
+    """The same history as FeedItems."""
+    return [FeedItem.from_feed_title(title, link, link, datetime.fromtimestamp(published, timezone.utc),
+                                     description, True)
+            for title, link, description, published in fields]
+
+def measure_allocated(build, fields):
+    """Returns the bytes still allocated after `build(fields)`, with its result alive."""
+    tracemalloc.start()
+    items = build(fields)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return allocated
+
+def bench_item_memory(count, repeat, results):
+    """Compares memory and build time of `count` items as dicts and as slotted FeedItems."""
+    fields = make_history_fields(count)
+    memory = {'items': count}
+    for model, build in (('dict', build_dict_items), ('slotted', build_slotted_items)):
+        results[f"item_build[{model},n={count}]"] = time_stage(lambda: build(fields), repeat)
+        allocated = measure_allocated(build, fields)
+        memory[f"{model}_bytes"] = allocated
+        memory[f"{model}_bytes_per_item"] = round(allocated / count, 1)
+    memory['saving'] = round(1 - memory['slotted_bytes'] / memory['dict_bytes'], 3)
+    return memory
+
+def git_commit():
+    """Returns the current git commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(sizes, repeat, fixtures_dir, memory_items=DEFAULT_MEMORY_ITEMS):
+    """Runs every benchmark stage and returns the results document."""
+    results = {}
+
+    print("📄 Benchmarking listing pages...")
+    pages, missing_fixtures = load_fixture_pages(fixtures_dir)
+    for url in missing_fixtures:
+        print(f"⚠️  No recorded page for {url} in {fixtures_dir}; only synthetic pages are timed for it. "
+              f"Record one with: python replay.py record {url}")
+    for host, source, html in pages:
+        bench_listing_page(f"fixture={host}", source, html, repeat, results)
+    source = gen.METRO_SOURCES[0]
+    for size in sizes:
+        bench_listing_page(f"n={size}", source, make_listing_html(size, source['name']), repeat, results)
+
+    print("📰 Benchmarking feed merge and render...")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            bench_feed(size, repeat, workdir, results)
+
+    print("🚇 Benchmarking timetable lookups...")
+    bench_timetables(repeat, results)
+
+    print(f"🧠 Measuring item memory for {memory_items} items...")
+    memory = bench_item_memory(memory_items, repeat, results) if memory_items else None
+
+    print("⏱️  Measuring no-change startup imports...")
+    results[f"import_time[{IMPORT_TIME_MODULE}]"], loaded = measure_import_time(IMPORT_TIME_MODULE, repeat)
+    eager_modules = sorted(m for m in LAZY_MODULES if m in loaded)
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': sizes,
+        'repeat': repeat,
+        'eager_modules': eager_modules,
+        'memory': memory,
+        'missing_fixtures': missing_fixtures,
+        'results': results
+    }
+
+def compare_results(current, baseline, max_regression):
+    """Returns (stage, baseline_s, current_s) for stages slower than the allowed regression."""
+    regressions = []
+    for stage, stats in current['results'].items():
+        base = baseline.get('results', {}).get(stage)
+        if not base:
+            continue
+        if stats['median_s'] > base['median_s'] * (1 + max_regression):
+            regressions.append((stage, base['median_s'], stats['median_s']))
+    return regressions
+
+def print_results(document):
+    """Prints a table of median timings."""
+    print("\n" + "=" * 50)
+    print("📊 BENCHMARK RESULTS (median)")
+    print("=" * 50)
+    for stage, stats in document['results'].items():
+        print(f"{stage:40} {stats['median_s'] * 1000:10.3f} ms")
+    memory = document.get('memory')
+    if memory:
+        print(f"\n🧠 {memory['items']} items: dicts {memory['dict_bytes_per_item']} B/item, "
+              f"FeedItem {memory['slotted_bytes_per_item']} B/item ({memory['saving']:.0%} smaller)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Metro RSS pipeline offline')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='Comma-separated synthetic item counts (e.g. 50,1000,100000)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Runs per stage')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Replay fixture store with recorded source pages')
+    parser.add_argument('--require-fixtures', action='store_true',
+                        help='Fail unless every source has a recorded listing page')
+    parser.add_argument('--output', default=DEFAULT_RESULTS_FILE, help='Where to write the JSON results')
+    parser.add_argument('--baseline', help='Previous results JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION,
+                        help='Allowed slowdown ratio before failing (0.25 = 25%%)')
+    parser.add_argument('--import-budget-ms', type=float, default=IMPORT_TIME_BUDGET_MS,
+                        help=f'Maximum import time of {IMPORT_TIME_MODULE} in milliseconds')
+    parser.add_argument('--memory-items', type=int, default=DEFAULT_MEMORY_ITEMS,
+                        help='Items for the dict vs FeedItem memory comparison (0 skips it)')
+
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+
+    print("🚇 Metro RSS Benchmark Suite")
+    print("=" * 50)
+
+    # Keep per-item pipeline logging out of the timings
+    logging.disable(logging.WARNING)
+    document = run_benchmarks(sizes, args.repeat, args.fixtures, args.memory_items)
+    logging.disable(logging.NOTSET)
+
+    print_results(document)
+
+    try:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+    except IOError as e:
+        print(f"⚠️  Could not save results: {e}")
+
+    exit_code = 0
+    import_ms = document['results'][f"import_time[{IMPORT_TIME_MODULE}]"]['median_s'] * 1000
+    if import_ms > args.import_budget_ms:
+        print(f"\n💥 {IMPORT_TIME_MODULE} import took {import_ms:.1f} ms, over the {args.import_budget_ms:.0f} ms budget")
+        exit_code = 1
+    if document['missing_fixtures']:
+        print(f"\n{'💥' if args.require_fixtures else '⚠️ '} {len(document['missing_fixtures'])} source(s) "
+              f"have no recorded fixture page, so their real listing pages were not benchmarked")
+        if args.require_fixtures:
+            exit_code = 1
+    if document['eager_modules']:
+        print(f"\n💥 {IMPORT_TIME_MODULE} imports {', '.join(document['eager_modules'])} at startup; "
+              f"they should only load when the feed is rebuilt")
+        exit_code = 1
+
+    if args.baseline:
+        try:
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)
+        except (IOError, json.JSONDecodeError) as e:
+            print(f"❌ Could not load baseline {args.baseline}: {e}")
+            return 1
+
+        regressions = compare_results(document, baseline, args.max_regression)
+        if regressions:
+            print(f"\n💥 {len(regressions)} stage(s) regressed by more than {args.max_regression:.0%}:")
+            for stage, base, current in regressions:
+                print(f"   {stage}: {base * 1000:.3f} ms -> {current * 1000:.3f} ms")
+            exit_code = 1
+        else:
+            print(f"\n🎉 No regressions against {args.baseline}")
+
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
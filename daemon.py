@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Daemon mode for the Metro RSS generator
+Runs generation cycles on an internal schedule and keeps the HTTP session,
+change-detection cache, feed items and GUID set in memory between cycles,
+so files are only read once at startup and only written when something changed
+"""
+
+import logging
+import signal
+import threading
+import time
+from datetime import datetime
+
+import generate_metro_rss as gen
+import poll_schedule
+from dedup import DEDUP_INDEX_FILE, NearDuplicateIndex
+from metrics import Metrics
+
+class WarmState:
+    """Feed state kept in memory between daemon cycles."""
+
+    def __init__(self):
+        self.cache = gen.load_cache()
+        self.guids = gen.load_existing_feed_guids(gen.RSS_FILENAME) | gen.load_archived_guids()
+        self.items = gen.load_feed_items(gen.RSS_FILENAME)
+        self.duplicates = NearDuplicateIndex.load(DEDUP_INDEX_FILE)
+        if self.duplicates.needs_seeding:
+            self.duplicates.add_items(self.items)
+        logging.info(f"Loaded warm state: {len(self.items)} feed items, {len(self.guids)} known GUIDs")
+
+def run_cycle(state):
+    """Runs one generation pass against the warm state. Returns True if the feed was rewritten."""
+    pages = {}
+    with gen.METRICS.span('change_check') as span:
+        changed_sources = gen.check_for_new_content(state.cache, pages)
+        span['changed'] = len(changed_sources)
+    if not changed_sources:
+        logging.info("No new content detected, skipping RSS generation")
+        return False
+
+    fetched_updates = gen.fetch_metro_updates(changed_sources, pages)
+    fetched_updates = gen.collapse_near_duplicates(fetched_updates, state.guids, state.duplicates)
+    gen.enrich_new_updates(fetched_updates, state.guids)
+    gen.update_search_index(fetched_updates)
+
+    new_updates = [update for update in fetched_updates if update.guid not in state.guids]
+    if not new_updates:
+        logging.info("No new updates found based on GUID comparison with the existing feed.")
+        return False
+
+    logging.info(f"{len(new_updates)} new update(s) found. Generating updated RSS feed.")
+    items = gen.generate_rss_feed(fetched_updates, state.guids, gen.RSS_FILENAME, old_items=state.items)
+    if items is None:
+        return False
+    # The archive step may have moved old items off the page; their GUIDs stay known
+    state.items = items
+    state.guids.update(update.guid for update in new_updates)
+    return True
+
+def run_daemon(args):
+    """Runs generation cycles every `args.interval` seconds until SIGINT/SIGTERM. Returns the exit code."""
+    stop = threading.Event()
+
+    def handle_signal(signum, frame):
+        logging.info(f"Received {signal.Signals(signum).name}, stopping after the current cycle")
+        stop.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    logging.info(f"Starting Metro RSS daemon (interval {args.interval:g}s)")
+    state = WarmState()
+    next_run = time.monotonic()
+    while not stop.is_set():
+        start_time = datetime.now()
+        gen.METRICS = Metrics()
+        try:
+            run_cycle(state)
+        except Exception as e:
+            logging.error(f"Unexpected error during daemon cycle: {e}", exc_info=True)
+        finally:
+            gen.write_metrics(args.metrics_file, args.metrics_history, args.prometheus)
+        logging.info(f"Cycle finished. Duration: {datetime.now() - start_time}")
+
+        # Skip cycles missed while a slow one was running instead of running them back to back,
+        # and wake early when a source's adaptive schedule makes it due sooner
+        next_run = max(next_run + args.interval, time.monotonic())
+        wait = next_run - time.monotonic()
+        next_poll = poll_schedule.seconds_until_next_poll(state.cache)
+        if next_poll is not None and next_poll < wait:
+            wait = next_poll
+            next_run = time.monotonic() + wait
+        stop.wait(wait)
+
+    gen.get_session().close()
+    logging.info("Metro RSS daemon stopped")
+    return 0
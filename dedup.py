@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate notice detection for the Metro RSS feed
+Fingerprints notice titles with a 64-bit SimHash over character shingles
+and finds near-duplicates
+through a banded LSH index, so each new item is compared only with the few
+history items sharing a band instead of with the whole history
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+
+DEDUP_INDEX_FILE = "dedup_index.json"
+FINGERPRINT_BITS = 64
+MAX_DISTANCE = 5            # Hamming distance still counted as the same notice
+BANDS = MAX_DISTANCE + 1    # Pigeonhole: fingerprints within MAX_DISTANCE share at least one band exactly
+BAND_BITS = FINGERPRINT_BITS // BANDS
+SHINGLE_SIZE = 4            # Characters per shingle; robust to small wording and spacing changes
+MIN_FEATURES = 16           # Titles with fewer shingles are too generic to match on
+DUPLICATE_WINDOW = 14 * 24 * 60 * 60  # Recurring titles further apart than this are separate notices
+TOKEN = re.compile(r'\w+')
+
+def normalize(text):
+    """Lower-cased words of `text` joined by single spaces (Unicode-aware, so Bangla works too)."""
+    return ' '.join(TOKEN.findall(text.lower()))
+
+def features(text):
+    """Overlapping character shingles of the normalized text."""
+    text = normalize(text)
+    return [text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)]
+
+def numbers(text):
+    """The numbers in a title; notices differing only in a number or date are distinct."""
+    return ' '.join(sorted(word for word in normalize(text).split() if word.isdigit()))
+
+def simhash(feature_list):
+    """64-bit SimHash of a list of string features: each bit is set when most feature hashes set it."""
+    # Column-wise counting over bit strings keeps the per-bit work in C
+    rows = [f"{int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big'):064b}"
+            for feature in feature_list]
+    majority = len(rows) / 2
+    return int(''.join('1' if column.count('1') > majority else '0' for column in zip(*rows)), 2)
+
+def fingerprint(item):
+    """(SimHash, numbers) of a FeedItem's title, or None if the title is too short to compare."""
+    feature_list = features(item.title)
+    if len(feature_list) < MIN_FEATURES:
+        return None
+    return simhash(feature_list), numbers(item.title)
+
+def bands(value):
+    """Splits a fingerprint into (band number, band bits) keys."""
+    mask = (1 << BAND_BITS) - 1
+    return [(band, value >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+class NearDuplicateIndex:
+    """Fingerprints of the notices published within DUPLICATE_WINDOW, banded for sub-linear lookup."""
+
+    def __init__(self):
+        self.fingerprints = {}  # guid -> ((simhash, numbers), published)
+        self.duplicates = {}    # duplicate guid -> guid of the notice it duplicates
+        self.buckets = {}       # (band, band bits) -> [guid, ...]
+        self.needs_seeding = True  # False once loaded from a saved index, which may legitimately be empty
+
+    def add(self, guid, value, published):
+        self.fingerprints[guid] = (value, published)
+        for key in bands(value[0]):
+            self.buckets.setdefault(key, []).append(guid)
+
+    def prune(self, now=None):
+        """Evicts fingerprints published more than DUPLICATE_WINDOW before `now`; nothing can match them
+        any more. Duplicate aliases are kept. Returns the number evicted."""
+        cutoff = (now if now is not None else time.time()) - DUPLICATE_WINDOW
+        expired = [guid for guid, (_, published) in self.fingerprints.items() if published < cutoff]
+        if not expired:
+            return 0
+        for guid in expired:
+            del self.fingerprints[guid]
+        # Buckets only hold live fingerprints, so lookups scale with the window, not the whole history
+        self.buckets = {}
+        for guid, (value, _) in self.fingerprints.items():
+            for key in bands(value[0]):
+                self.buckets.setdefault(key, []).append(guid)
+        return len(expired)
+
+    def find(self, value, published):
+        """Returns the GUID of an indexed near-duplicate published within the window, or None."""
+        simhash_value, number_text = value
+        seen = set()
+        for key in bands(simhash_value):
+            for guid in self.buckets.get(key, ()):
+                if guid in seen:
+                    continue
+                seen.add(guid)
+                (other, other_numbers), other_published = self.fingerprints[guid]
+                if (number_text == other_numbers and abs(published - other_published) <= DUPLICATE_WINDOW
+                        and bin(simhash_value ^ other).count('1') <= MAX_DISTANCE):
+                    return guid
+        return None
+
+    def add_items(self, items):
+        """Indexes items that aren't indexed yet and are recent enough to match. Returns the number added."""
+        cutoff = time.time() - DUPLICATE_WINDOW
+        added = 0
+        for item in items:
+            if item.guid in self.fingerprints or item.guid in self.duplicates or item.published < cutoff:
+                continue
+            value = fingerprint(item)
+            if value is not None:
+                self.add(item.guid, value, item.published)
+                added += 1
+        return added
+
+    def collapse(self, updates, known_guids):
+        """Drops updates that near-duplicate an indexed notice or an earlier update in the batch.
+
+        Kept updates are indexed; dropped GUIDs are remembered and added to
+        `known_guids` so later runs treat them as seen. Returns the kept updates.
+        """
+        kept = []
+        for update in updates:
+            if update.guid in known_guids or update.guid in self.fingerprints:
+                kept.append(update)
+                continue
+            value = fingerprint(update)
+            original = self.find(value, update.published) if value is not None else None
+            if original is None:
+                if value is not None:
+                    self.add(update.guid, value, update.published)
+                kept.append(update)
+                continue
+            self.duplicates[update.guid] = original
+            known_guids.add(update.guid)
+            logging.info(f"Collapsed near-duplicate {update.guid} ({update.feed_title}) into {original}")
+        return kept
+
+    def save(self, filename=DEDUP_INDEX_FILE):
+        with open(filename, 'w') as f:
+            json.dump({
+                'max_distance': MAX_DISTANCE,
+                'fingerprints': {guid: [f"{simhash_value:016x}", number_text, published]
+                                 for guid, ((simhash_value, number_text), published) in self.fingerprints.items()},
+                'duplicates': self.duplicates
+            }, f)
+
+    @classmethod
+    def load(cls, filename=DEDUP_INDEX_FILE):
+        """Loads the persisted index, or an empty one if missing or unreadable."""
+        index = cls()
+        if not os.path.exists(filename):
+            return index
+        try:
+            with open(filename, 'r') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.warning(f"Could not load near-duplicate index {filename}: {e}. Starting fresh.")
+            return index
+        if data.get('max_distance') != MAX_DISTANCE:
+            # Band layout depends on the threshold; the index is rebuilt from the feed
+            logging.info(f"Near-duplicate index {filename} uses a different threshold. Rebuilding.")
+            return index
+        for guid, (simhash_value, number_text, published) in data.get('fingerprints', {}).items():
+            index.add(guid, (int(simhash_value, 16), number_text), published)
+        index.duplicates = data.get('duplicates', {})
+        index.needs_seeding = False
+        return index
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Detail-page enrichment for Metro notices
+Fetches the linked detail page of each new notice concurrently (with a
+per-host limit) to pick up the full notice text and attachment links.
+Extracted results are kept in a URL-keyed on-disk cache with TTL and
+size-based eviction, so each detail page is downloaded once
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+import generate_metro_rss as gen
+from replay import resolve_url
+
+DETAIL_CACHE_DIR = "detail_cache"
+DETAIL_CACHE_TTL = 90 * 24 * 60 * 60       # Seconds a cached detail page stays valid
+DETAIL_CACHE_MAX_BYTES = 20 * 1024 * 1024  # Oldest entries are evicted beyond this
+MAX_WORKERS = 8
+MAX_PER_HOST = 2                           # Government sites get slow under parallel load
+MAX_DESCRIPTION_CHARS = 4000
+
+def cache_path(url, cache_dir=DETAIL_CACHE_DIR):
+    """Returns the cache file for a detail page URL."""
+    return os.path.join(cache_dir, f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json")
+
+def load_cached_detail(url, cache_dir=DETAIL_CACHE_DIR, ttl=DETAIL_CACHE_TTL):
+    """Returns the cached detail for `url`, or None if missing, expired or unreadable."""
+    path = cache_path(url, cache_dir)
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return entry if entry.get('url') == url else None
+
+def save_cached_detail(url, detail, cache_dir=DETAIL_CACHE_DIR):
+    """Writes a detail entry atomically so a crash never leaves a torn cache file."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(url, cache_dir)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump({'url': url, **detail}, f, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+def evict_detail_cache(cache_dir=DETAIL_CACHE_DIR, ttl=DETAIL_CACHE_TTL, max_bytes=DETAIL_CACHE_MAX_BYTES):
+    """Removes expired entries, then the oldest ones until the cache fits `max_bytes`.
+    Returns the number of entries removed."""
+    if not os.path.isdir(cache_dir):
+        return 0
+    now = time.time()
+    entries = []
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(cache_dir, name)
+        stat = os.stat(path)
+        if now - stat.st_mtime > ttl:
+            os.remove(path)
+            removed += 1
+        else:
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+    if removed:
+        logging.info(f"Evicted {removed} detail cache entries")
+    return removed
+
+def extract_detail(content, source, page_url):
+    """Extracts the notice text and attachment links from a detail page."""
+    soup = gen.parse_source_page(content)
+    body = gen.compile_selector(source['detail_selector']).select_one(soup)
+    text = ' '.join(body.get_text(' ', strip=True).split()) if body else ''
+    attachments = []
+    # Only links inside the notice body; page chrome often links unrelated PDFs
+    for link in gen.compile_selector(source['attachment_selector']).select(body) if body else []:
+        href = urljoin(page_url, link.get('href', ''))
+        if href.startswith(('http://', 'https://')) and href not in attachments:
+            attachments.append(href)
+    return {'text': text[:MAX_DESCRIPTION_CHARS], 'attachments': attachments}
+
+def fetch_detail(url, source, host_limits, metrics):
+    """Downloads and extracts one detail page, holding its host's slot. Returns the detail or None."""
+    with host_limits[urlparse(url).netloc]:
+        with metrics.span('fetch', source=source['name'], phase='detail') as span:
+            try:
+                response = gen.get_session().get(resolve_url(url), timeout=30, stream=True)
+                span['status'] = response.status_code
+                content, span['bytes'] = gen.read_body(response, source.get('max_bytes', gen.MAX_BODY_BYTES))
+            except Exception as e:
+                span['error'] = type(e).__name__
+                logging.warning(f"Could not fetch detail page {url}: {e}")
+                return None
+    return extract_detail(content, source, url)
+
+def apply_detail(update, detail):
+    """Replaces a listing snippet with the full notice text and lists its attachments."""
+    if len(detail['text']) > len(update.description):
+        update.description = detail['text']
+    if detail['attachments']:
+        update.description += '\n\nAttachments:\n' + '\n'.join(detail['attachments'])
+
+def enrich_updates(updates, known_guids, metrics, cache_dir=DETAIL_CACHE_DIR):
+    """Adds detail-page content to updates whose GUIDs aren't in `known_guids`.
+    Detail fetches are recorded as 'fetch' spans (phase 'detail') on `metrics`.
+    Returns (enriched from cache, enriched from downloads)."""
+    sources = {source['name']: source for source in gen.METRO_SOURCES}
+    pending = {}
+    for update in updates:
+        source = sources.get(update.source)
+        if (update.guid in known_guids or not update.is_permalink or not source
+                or 'detail_selector' not in source):
+            continue
+        pending.setdefault(update.link, (source, []))[1].append(update)
+
+    from_cache = 0
+    to_fetch = {}
+    for url, (source, url_updates) in pending.items():
+        detail = load_cached_detail(url, cache_dir)
+        if detail is None:
+            to_fetch[url] = (source, url_updates)
+            continue
+        for update in url_updates:
+            apply_detail(update, detail)
+        from_cache += 1
+
+    downloaded = 0
+    if to_fetch:
+        host_limits = {urlparse(url).netloc: threading.BoundedSemaphore(MAX_PER_HOST) for url in to_fetch}
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(to_fetch))) as executor:
+            futures = {url: executor.submit(fetch_detail, url, source, host_limits, metrics)
+                       for url, (source, _) in to_fetch.items()}
+        for url, future in futures.items():
+            try:
+                detail = future.result()
+            except Exception as e:
+                logging.warning(f"Could not extract detail page {url}: {e}")
+                continue
+            if detail is None:
+                continue
+            save_cached_detail(url, detail, cache_dir)
+            for update in to_fetch[url][1]:
+                apply_detail(update, detail)
+            downloaded += 1
+
+    evict_detail_cache(cache_dir)
+    logging.info(f"Enriched {from_cache + downloaded} new notice(s): {from_cache} cached, {downloaded} downloaded")
+    return from_cache, downloaded
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Archived feed pages for the Metro RSS feed (RFC 5005)
+Moves items that no longer fit on the current page into immutable,
+content-hashed archive pages linked together with prev-archive links
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+ARCHIVE_DIR = "archive"
+ARCHIVE_INDEX_FILE = "index.json"
+ARCHIVE_GUIDS_FILE = "guids.txt"
+ARCHIVE_PAGE_SIZE = 25
+FH_NAMESPACE = "http://purl.org/syndication/history/1.0"
+
+def load_archive_index(archive_dir=ARCHIVE_DIR):
+    """Loads the archive index, or an empty one if there are no archive pages yet."""
+    path = os.path.join(archive_dir, ARCHIVE_INDEX_FILE)
+    if not os.path.exists(path):
+        return {'latest': None, 'pages': []}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def load_archived_guids(archive_dir=ARCHIVE_DIR):
+    """Loads the GUIDs of every archived item, so they are not re-added as new."""
+    path = os.path.join(archive_dir, ARCHIVE_GUIDS_FILE)
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+def write_archive_page(items, prev_file, render, archive_dir=ARCHIVE_DIR):
+    """Renders `items` as an archive page named after its content hash. Returns the filename."""
+    # A page can't name its own hash, so archive pages are rendered without a self link
+    content = render(items, prev_file)
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    filename = os.path.join(archive_dir, f"page-{digest}.xml")
+    if not os.path.exists(filename):
+        with open(filename, 'wb') as f:
+            f.write(content)
+    return filename
+
+def archive_overflow(items, max_items, render, page_size=ARCHIVE_PAGE_SIZE, archive_dir=ARCHIVE_DIR):
+    """Moves the oldest items into archive pages once the current page has a full page extra.
+
+    `items` are sorted newest first. The current page keeps between `max_items`
+    and `max_items + page_size - 1` items, so existing archive pages never need
+    rewriting. `render(items, prev_file)` renders an archive page. Returns
+    (current page items, latest archive page filename or None).
+    """
+    index = load_archive_index(archive_dir)
+    full_pages = max(0, len(items) - max_items) // page_size
+    if full_pages == 0:
+        return items, index['latest']
+
+    os.makedirs(archive_dir, exist_ok=True)
+    keep = len(items) - full_pages * page_size
+    overflow = items[keep:]
+
+    # Oldest page first so each page can link to the one before it
+    archived_guids = []
+    for end in range(len(overflow), 0, -page_size):
+        page_items = overflow[max(0, end - page_size):end]
+        filename = write_archive_page(page_items, index['latest'], render, archive_dir)
+        index['pages'].append({
+            'file': filename,
+            'prev': index['latest'],
+            'items': len(page_items),
+            'newest': page_items[0].pub_date.isoformat(),
+            'oldest': page_items[-1].pub_date.isoformat()
+        })
+        index['latest'] = filename
+        archived_guids.extend(item.guid for item in page_items)
+        logging.info(f"Archived {len(page_items)} items to {filename}")
+
+    with open(os.path.join(archive_dir, ARCHIVE_GUIDS_FILE), 'a', encoding='utf-8') as f:
+        f.writelines(f"{guid}\n" for guid in archived_guids)
+    with open(os.path.join(archive_dir, ARCHIVE_INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    return items[:keep], index['latest']
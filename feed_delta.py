@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Static delta feeds for Metro RSS readers
+Publishes, for each of the last few builds, an RSS document with only the
+items added since that build, plus an index telling clients which one to
+fetch (RFC 3229 feed deltas, done with static files)
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+DELTA_DIR = "deltas"
+DELTA_INDEX_FILE = "index.json"
+MAX_DELTA_BUILDS = 10  # Previous builds a client can catch up from with a delta
+
+def new_build_id():
+    """Returns a build ID for a feed generated now (also used in the feed's <version>)."""
+    return datetime.now().strftime("%Y%m%d.%H%M%S")
+
+def delta_filename(build_id, delta_dir=DELTA_DIR):
+    """Returns the delta file holding items added since `build_id`."""
+    return os.path.join(delta_dir, f"since-{build_id}.xml")
+
+def load_delta_index(delta_dir=DELTA_DIR):
+    """Loads the delta index, or an empty one if missing or unreadable."""
+    path = os.path.join(delta_dir, DELTA_INDEX_FILE)
+    if not os.path.exists(path):
+        return {'builds': []}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        logging.warning(f"Could not load delta index {path}: {e}. Starting fresh.")
+        return {'builds': []}
+
+def publish_deltas(items, new_guids, build_id, feed_filename, render, delta_dir=DELTA_DIR,
+                   max_builds=MAX_DELTA_BUILDS):
+    """Writes delta feeds for the last `max_builds` builds and updates the index.
+
+    `items` are the FeedItems in the new feed, `new_guids` the GUIDs this build
+    added and `render(items, filename)` renders RSS bytes. Returns the index.
+    """
+    os.makedirs(delta_dir, exist_ok=True)
+    index = load_delta_index(delta_dir)
+
+    builds = [{
+        'id': build_id,
+        'built_at': datetime.now(timezone.utc).isoformat(),
+        'guids': sorted(new_guids)
+    }] + index.get('builds', [])
+    builds = builds[:max_builds + 1]
+
+    items_by_guid = {item.guid: item for item in items}
+    deltas = {}
+    added_since = []
+    # Walk back from the newest build: the delta for build N holds everything added after it
+    for newer, older in zip(builds, builds[1:]):
+        added_since.extend(guid for guid in newer['guids'] if guid in items_by_guid)
+        filename = delta_filename(older['id'], delta_dir)
+        delta_items = sorted((items_by_guid[guid] for guid in added_since),
+                             key=lambda x: x.published, reverse=True)
+        with open(filename, 'wb') as f:
+            f.write(render(delta_items, filename))
+        deltas[older['id']] = {'file': filename, 'items': len(delta_items)}
+
+    # Remove deltas for builds that fell out of the window
+    keep = {os.path.basename(d['file']) for d in deltas.values()}
+    for name in os.listdir(delta_dir):
+        if name.startswith('since-') and name.endswith('.xml') and name not in keep:
+            os.remove(os.path.join(delta_dir, name))
+
+    index = {
+        'current': build_id,
+        'feed': feed_filename,
+        'builds': builds,
+        'deltas': deltas
+    }
+    with open(os.path.join(delta_dir, DELTA_INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    logging.info(f"Published {len(deltas)} delta feed(s) for build {build_id}")
+    return index
+
+def resolve_delta(index, last_build_id):
+    """Tells a client what to fetch given the last build it saw.
+
+    Returns None when it is up to date, the delta file when one covers its
+    build, or the full feed filename otherwise.
+    """
+    if last_build_id == index.get('current'):
+        return None
+    delta = index.get('deltas', {}).get(last_build_id)
+    return delta['file'] if delta else index.get('feed')
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Compact item model for Metro feed entries
+One slotted object per notice instead of a dict: source names are interned,
+titles are stored without the '[Source] ' prefix and publication times are
+epoch seconds, which keeps large in-memory histories small
+"""
+
+import re
+import sys
+from datetime import datetime, timezone
+
+SOURCE_PREFIX = re.compile(r'^\[(?P<source>[^\]]+)\]\s*')
+
+def split_source_prefix(title):
+    """Splits '[Source] Title' into ('Source', 'Title'); (None, title) without a prefix."""
+    match = SOURCE_PREFIX.match(title)
+    if not match:
+        return None, title
+    return match.group('source'), title[match.end():]
+
+class FeedItem:
+    """A feed entry, validated once when it is built."""
+    __slots__ = ('title', 'link', 'guid', 'is_permalink', 'published', 'description', 'source')
+
+    def __init__(self, title, link, guid, published, description='', source=None, is_permalink=False):
+        """`title` is the bare notice title; `published` an aware datetime or epoch seconds."""
+        if not title:
+            raise ValueError("Feed item needs a title")
+        if not guid:
+            raise ValueError(f"Feed item '{title}' needs a GUID")
+        if isinstance(published, datetime):
+            if published.tzinfo is None:
+                raise ValueError(f"Feed item '{title}' has a naive publication date")
+            published = published.timestamp()
+        self.title = title
+        self.link = link
+        self.guid = guid
+        self.is_permalink = bool(is_permalink)
+        self.published = int(published)
+        self.description = description or ''
+        self.source = sys.intern(source) if source else None
+
+    @classmethod
+    def from_feed_title(cls, feed_title, link, guid, published, description='', is_permalink=False):
+        """Builds an item from a '[Source] Title' string as it appears in the RSS feed."""
+        source, title = split_source_prefix(feed_title)
+        return cls(title, link, guid, published, description, source, is_permalink)
+
+    @property
+    def feed_title(self):
+        """The title as published, prefixed with the source name."""
+        return f"[{self.source}] {self.title}" if self.source else self.title
+
+    @property
+    def pub_date(self):
+        """The publication time as an aware UTC datetime."""
+        return datetime.fromtimestamp(self.published, timezone.utc)
+
+    def __repr__(self):
+        return f"FeedItem(guid={self.guid!r}, title={self.feed_title!r}, published={self.published})"
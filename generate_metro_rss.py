@@ -1,7 +1,6 @@
+# BeautifulSoup, ElementTree and minidom are imported inside the functions that
+# need them, so runs that stop at the change check don't pay for loading them.
 import requests
-from bs4 import BeautifulSoup
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
 from datetime import datetime, timezone, timedelta
 import os
 import hashlib
@@ -10,17 +9,30 @@ import sys
 import json
 import time
 import logging
+import argparse
+from functools import lru_cache
+
+from metrics import Metrics, METRICS_FILE, METRICS_HISTORY_FILE
+from profiling import add_profile_arguments, run_profiled
+from replay import resolve_url
+from feed_delta import new_build_id, publish_deltas
+from feed_archive import FH_NAMESPACE, archive_overflow, load_archived_guids
+from feed_item import FeedItem
+import poll_schedule
 
 # --- Logging Configuration ---
 LOG_FILE = "metro_rss_generator.log"
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+
+def setup_logging():
+    """Configures file and console logging for a generator run."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
 
 # --- Configuration ---
 # Metro-related news and updates sources
@@ -32,7 +44,9 @@ METRO_SOURCES = [
         'title_selector': 'h4 a, h3 a, .title',
         'summary_selector': '.excerpt, .description, p',
         'link_selector': 'a',
-        'date_selector': '.date, .published-date, time'
+        'date_selector': '.date, .published-date, time',
+        'detail_selector': '.notice-details, .content-details, article, #printable_area',
+        'attachment_selector': 'a[href$=".pdf"], a[href$=".doc"], a[href$=".docx"], a[href*="/files/"]'
     },
     {
         'name': 'Bangladesh Railway',
@@ -41,12 +55,14 @@ METRO_SOURCES = [
         'title_selector': 'h4 a, h3 a, .title',
         'summary_selector': '.excerpt, .description, p',
         'link_selector': 'a',
-        'date_selector': '.date, .published-date, time'
+        'date_selector': '.date, .published-date, time',
+        'detail_selector': '.notice-details, .content-details, article, #printable_area',
+        'attachment_selector': 'a[href$=".pdf"], a[href$=".doc"], a[href$=".docx"], a[href*="/files/"]'
     }
 ]
 
 RSS_FILENAME = "metro_feed.xml"
-MAX_FEED_ITEMS = 50
+MAX_FEED_ITEMS = 50  # Minimum kept on the current page; older items move to archive pages
 FEED_TITLE = "Dhaka Metro & Public Transport Updates"
 FEED_LINK = "https://owais5514.github.io/Metro-timings/"
 FEED_DESCRIPTION = "Latest updates on Dhaka Metro Rail (MRT), public transport, and transit announcements."
@@ -57,191 +73,302 @@ LOCAL_TIMEZONE = timezone(timedelta(hours=6))
 # Cache file for storing the last check's content hash
 CACHE_FILE = "metro_cache.json"
 
-def check_for_new_content():
-    """Checks if there are new updates by comparing page content hash with previous run.
-    Returns True if new content is available or cache doesn't exist, False otherwise."""
-    
-    # Check if we need to force a refresh (weekly)
-    force_refresh = False
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r') as f:
-                cache = json.load(f)
-                if 'last_check' in cache:
-                    last_check = datetime.fromisoformat(cache['last_check'])
-                    now = datetime.now(timezone.utc)
-                    # Force refresh if last check was more than 7 days ago
-                    if (now - last_check).days >= 7:
-                        logging.info("Performing weekly forced refresh regardless of content change")
-                        force_refresh = True
-        except (json.JSONDecodeError, IOError, ValueError) as e:
-            logging.warning(f"Could not check last refresh time: {e}")
-            
-    if force_refresh:
-        return True
-        
+# Per-stage timings and counters for the current run
+METRICS = Metrics()
+
+# Matches the scheduled workflow's six-hour cadence
+DAEMON_INTERVAL_SECONDS = 6 * 60 * 60
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Source pages are streamed in chunks and abandoned past this size (after decompression)
+MAX_BODY_BYTES = 5 * 1024 * 1024
+BODY_CHUNK_BYTES = 64 * 1024
+
+# Shared HTTP session so repeated requests to a host reuse its connection
+_SESSION = None
+
+def get_session():
+    """Returns the shared requests session, creating it on first use."""
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = requests.Session()
+        _SESSION.headers['User-Agent'] = USER_AGENT
+    return _SESSION
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """A response body exceeded the size limit for its source."""
+
+def read_body(response, max_bytes=MAX_BODY_BYTES, digest=None, keep=True):
+    """Reads a streamed response chunk by chunk, feeding each chunk to `digest` (a hashlib object).
+    Returns (body, size); the body is b'' when `keep` is False, so only one chunk is held at a time.
+    Raises for HTTP error statuses, and ResponseTooLarge as soon as more than `max_bytes` arrive.
+    The response is always closed, returning its connection to the session's pool."""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        # Try to load previously saved hash
-        cache = {}
-        if os.path.exists(CACHE_FILE):
-            try:
-                with open(CACHE_FILE, 'r') as f:
-                    cache = json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
-                logging.warning(f"Could not load cache file: {e}")
-        
-        # Check each source for changes
-        combined_content = ""
-        for source in METRO_SOURCES:
+        response.raise_for_status()
+        declared = response.headers.get('Content-Length', '')
+        if declared.isdigit() and int(declared) > max_bytes:
+            raise ResponseTooLarge(f"{response.url} declares {declared} bytes (limit {max_bytes})")
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(BODY_CHUNK_BYTES):
+            size += len(chunk)
+            if size > max_bytes:
+                raise ResponseTooLarge(f"{response.url} sent more than {max_bytes} bytes")
+            if digest is not None:
+                digest.update(chunk)
+            if keep:
+                chunks.append(chunk)
+    finally:
+        response.close()
+    return b''.join(chunks), size
+
+def load_cache():
+    """Loads the change-check cache, or an empty one if it is missing or unreadable."""
+    if not os.path.exists(CACHE_FILE):
+        return {}
+    try:
+        with open(CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        logging.warning(f"Could not load cache file: {e}")
+        return {}
+
+def save_cache(cache):
+    """Writes the change-detection cache, logging rather than failing on errors."""
+    try:
+        with open(CACHE_FILE, 'w') as f:
+            json.dump(cache, f, indent=2)
+    except IOError as e:
+        logging.warning(f"Could not save cache file: {e}")
+
+def check_for_new_content(cache=None, pages=None):
+    """Polls the sources whose adaptive schedule says they are due and compares the
+    notices on each page with the previous poll.
+    Returns the sources whose content changed (empty if none did or none were due).
+    A `cache` dict kept in memory between runs is used instead of re-reading CACHE_FILE
+    and is updated in place; the file is only rewritten when a source was polled.
+    If a `pages` dict is given, the parsed listing page of each changed source is stored
+    in it by source name, so fetch_metro_updates can extract from it without a second download."""
+    if cache is None:
+        cache = load_cache()
+
+    now = datetime.now(timezone.utc)
+    changed_sources = []
+    polled = 0
+    for source in METRO_SOURCES:
+        schedule = poll_schedule.source_schedule(cache, source['name'])
+        if not poll_schedule.is_due(schedule, now):
+            logging.info(f"Skipping {source['name']}: next check at {schedule['next_check']}")
+            continue
+
+        polled += 1
+        with METRICS.span('fetch', source=source['name'], phase='change_check') as span:
+            digest = hashlib.md5()
             try:
-                response = requests.get(source['url'], headers=headers, timeout=15)
-                if response.status_code == 200:
-                    combined_content += response.text
+                response = get_session().get(resolve_url(source['url']), timeout=15, stream=True)
+                span['status'] = response.status_code
+                content, size = read_body(response, source.get('max_bytes', MAX_BODY_BYTES), digest)
+                span['bytes'] = size
+                METRICS.increment('fetch_bytes_total', size, source=source['name'])
+                # Identical bytes mean identical notices, so only a changed page is parsed
+                page_hash = digest.hexdigest()
+                soup = None
+                if page_hash == schedule.get('page_hash'):
+                    content_hash = schedule['content_hash']
+                else:
+                    soup = parse_source_page(content)
+                    content_hash = notice_fingerprint(soup, source)
+                    schedule['page_hash'] = page_hash
             except Exception as e:
-                logging.warning(f"Could not fetch {source['name']}: {e}")
+                span['error'] = type(e).__name__
+                METRICS.increment('fetch_errors_total', source=source['name'])
+                poll_schedule.record_failure(schedule, now)
+                backoff = (datetime.fromisoformat(schedule['next_check']) - now).total_seconds()
+                logging.warning(f"Could not fetch {source['name']}: {e}. Backing off for {backoff / 3600:.1f}h")
                 continue
+            span['changed'] = poll_schedule.record_poll(schedule, content_hash, now)
+
+        if span['changed']:
+            changed_sources.append(source)
+            if pages is not None:
+                pages[source['name']] = soup
+            logging.info(f"New content detected from {source['name']}")
+        logging.info(f"Next check of {source['name']} in {schedule['interval'] / 3600:.1f}h")
+
+    if polled:
+        cache['last_check'] = now.isoformat()
+        save_cache(cache)
+    if not changed_sources:
+        logging.info("No source content changed since its previous check")
+    return changed_sources
+
+@lru_cache(maxsize=None)
+def compile_selector(selector):
+    """Compiles a CSS selector once and reuses it for every page and element."""
+    import soupsieve
+    return soupsieve.compile(selector)
+
+def parse_source_page(content):
+    """Parses a source listing page into a BeautifulSoup tree."""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(content, 'lxml')
+
+def extract_notice_identity(element, source):
+    """Returns (title, summary, link, guid, is_permalink) of a notice element, or None without a title."""
+    title_tag = compile_selector(source['title_selector']).select_one(element)
+    title = title_tag.get_text(strip=True) if title_tag else None
+    
+    if not title:
+        return None
+    
+    # Extract summary
+    summary_tag = compile_selector(source['summary_selector']).select_one(element)
+    summary = summary_tag.get_text(strip=True) if summary_tag else ''
+    
+    # Extract link
+    link_tag = compile_selector(source['link_selector']).select_one(element)
+    link = None
+    if link_tag and link_tag.get('href'):
+        link = link_tag['href']
+        if not link.startswith(('http://', 'https://')):
+            link = urljoin(source['url'], link)
+    else:
+        link = source['url']
+    
+    # Generate GUID
+    if link and link != source['url']:
+        guid = link
+        is_permalink = True
+    else:
+        guid_content = f"{title}-{summary}-{source['name']}"
+        guid = hashlib.sha1(guid_content.encode('utf-8')).hexdigest()
+        is_permalink = False
+    
+    return title, summary, link, guid, is_permalink
+
+def notice_fingerprint(soup, source):
+    """Hash of the notice GUIDs on a parsed listing page. Unlike a hash of the raw page it ignores
+    tokens, counters and timestamps elsewhere on the page, so it only changes with the notices."""
+    guids = []
+    for element in compile_selector(source['selector']).select(soup):
+        try:
+            identity = extract_notice_identity(element, source)
+        except Exception:
+            continue
+        if identity:
+            guids.append(identity[3])
+    return hashlib.sha1('\n'.join(sorted(guids)).encode('utf-8')).hexdigest()
+
+def extract_source_updates(soup, source):
+    """Extracts FeedItems from a parsed source listing page."""
+    updates = []
+    update_elements = compile_selector(source['selector']).select(soup)
+    
+    if not update_elements:
+        logging.warning(f"No update elements found for {source['name']} using selector '{source['selector']}'")
+        return updates
         
-        if not combined_content:
-            logging.warning("No content fetched from any source")
-            return True  # Proceed anyway to be safe
+    logging.info(f"Found {len(update_elements)} potential update elements for {source['name']}")
+    
+    for element in update_elements:
+        try:
+            identity = extract_notice_identity(element, source)
+            if not identity:
+                continue
+            title, summary, link, guid, is_permalink = identity
             
-        content_hash = hashlib.md5(combined_content.encode()).hexdigest()
-        
-        # If we have a previous hash and it matches, no new content
-        if 'content_hash' in cache and cache['content_hash'] == content_hash:
-            logging.info("Content hash matches previous check, no new updates")
-            return False
+            # Extract or generate date
+            pub_date = None
+            date_tag = compile_selector(source['date_selector']).select_one(element)
+            if date_tag:
+                date_text = date_tag.get_text(strip=True)
+                # Try to parse various date formats
+                for date_format in ['%Y-%m-%d', '%d-%m-%Y', '%b %d, %Y', '%B %d, %Y']:
+                    try:
+                        parsed_date = datetime.strptime(date_text, date_format)
+                        now_bd = datetime.now(LOCAL_TIMEZONE)
+                        local_dt = parsed_date.replace(hour=now_bd.hour, minute=now_bd.minute, second=now_bd.second)
+                        aware_local_dt = local_dt.replace(tzinfo=LOCAL_TIMEZONE)
+                        pub_date = aware_local_dt.astimezone(timezone.utc)
+                        break
+                    except ValueError:
+                        continue
             
-        # Save new hash for next time
-        new_cache = {
-            'content_hash': content_hash,
-            'last_check': datetime.now(timezone.utc).isoformat()
-        }
-        
-        try:
-            with open(CACHE_FILE, 'w') as f:
-                json.dump(new_cache, f)
-        except IOError as e:
-            logging.warning(f"Could not save cache file: {e}")
+            # Fallback to current time if date parsing failed
+            if pub_date is None:
+                pub_date = datetime.now(timezone.utc)
             
-        logging.info("New content detected, will process updates")
-        return True
-        
-    except Exception as e:
-        logging.error(f"Error checking for new content: {e}")
-        # If any error occurs, proceed with processing to be safe
-        return True
-
-def fetch_metro_updates():
-    """Fetches and parses metro updates from various sources."""
-    all_updates = []
+            description = summary if summary else title
+            
+            logging.info(f"Found update from {source['name']}: Title='{title}', Link='{link}', Date='{pub_date}'")
+            updates.append(FeedItem(title, link, guid, pub_date, description, source['name'], is_permalink))
+            
+        except Exception as e:
+            logging.warning(f"Error processing update element from {source['name']}: {e}")
+            continue
     
-    for source in METRO_SOURCES:
-        logging.info(f"Fetching updates from {source['name']}: {source['url']}")
-        max_retries = 3
-        retry_delay = 5
-        
+    return updates
+
+def fetch_source_page(source):
+    """Downloads and parses a source listing page, retrying transient errors. Returns None on failure."""
+    logging.info(f"Fetching updates from {source['name']}: {source['url']}")
+    max_retries = 3
+    retry_delay = 5
+
+    content = None
+    with METRICS.span('fetch', source=source['name'], phase='update') as span:
         for attempt in range(max_retries):
+            span['retries'] = attempt
             try:
-                headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-                response = requests.get(source['url'], headers=headers, timeout=30)
-                response.raise_for_status()
+                response = get_session().get(resolve_url(source['url']), timeout=30, stream=True)
+                span['status'] = response.status_code
+                content, size = read_body(response, source.get('max_bytes', MAX_BODY_BYTES))
+                span['bytes'] = size
+                METRICS.increment('fetch_bytes_total', size, source=source['name'])
                 logging.info(f"Successfully fetched {source['name']}. Status code: {response.status_code}")
                 break
             except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
+                METRICS.increment('fetch_errors_total', source=source['name'])
+                # An oversized page won't shrink on retry
+                if attempt < max_retries - 1 and not isinstance(e, ResponseTooLarge):
+                    METRICS.increment('fetch_retries_total', source=source['name'])
                     wait_time = retry_delay * (attempt + 1)
                     logging.warning(f"Error fetching {source['url']}: {e}. Retrying in {wait_time} seconds... (Attempt {attempt+1}/{max_retries})")
                     time.sleep(wait_time)
                 else:
-                    logging.error(f"Error fetching {source['url']} after {max_retries} attempts: {e}")
-                    continue
+                    span['error'] = type(e).__name__
+                    logging.error(f"Error fetching {source['url']} after {attempt + 1} attempt(s): {e}")
+                    break
+
+    if content is None:
+        return None
+
+    try:
+        with METRICS.span('parse', source=source['name']):
+            return parse_source_page(content)
+    except Exception as e:
+        logging.error(f"Error parsing content from {source['name']}: {e}")
+        return None
+
+def fetch_metro_updates(sources=None, pages=None):
+    """Fetches and parses metro updates from `sources` (default: every source).
+    Sources with a page in `pages` (parsed by check_for_new_content) aren't downloaded again."""
+    all_updates = []
+    
+    for source in sources or METRO_SOURCES:
+        soup = (pages or {}).get(source['name'])
+        if soup is None:
+            soup = fetch_source_page(source)
+        if soup is None:
+            continue
 
-        # Parse the content
         try:
-            soup = BeautifulSoup(response.content, 'lxml')
-            update_elements = soup.select(source['selector'])
-            
-            if not update_elements:
-                logging.warning(f"No update elements found for {source['name']} using selector '{source['selector']}'")
-                continue
-                
-            logging.info(f"Found {len(update_elements)} potential update elements for {source['name']}")
-            
-            for element in update_elements:
-                try:
-                    # Extract title
-                    title_tag = element.select_one(source['title_selector'])
-                    title = title_tag.get_text(strip=True) if title_tag else None
-                    
-                    if not title:
-                        continue
-                    
-                    # Extract summary
-                    summary_tag = element.select_one(source['summary_selector'])
-                    summary = summary_tag.get_text(strip=True) if summary_tag else ''
-                    
-                    # Extract link
-                    link_tag = element.select_one(source['link_selector'])
-                    link = None
-                    if link_tag and link_tag.get('href'):
-                        link = link_tag['href']
-                        if not link.startswith(('http://', 'https://')):
-                            link = urljoin(source['url'], link)
-                    else:
-                        link = source['url']
-                    
-                    # Generate GUID
-                    if link and link != source['url']:
-                        guid = link
-                        is_permalink = True
-                    else:
-                        guid_content = f"{title}-{summary}-{source['name']}"
-                        guid = hashlib.sha1(guid_content.encode('utf-8')).hexdigest()
-                        is_permalink = False
-                    
-                    # Extract or generate date
-                    pub_date = None
-                    date_tag = element.select_one(source['date_selector'])
-                    if date_tag:
-                        date_text = date_tag.get_text(strip=True)
-                        # Try to parse various date formats
-                        for date_format in ['%Y-%m-%d', '%d-%m-%Y', '%b %d, %Y', '%B %d, %Y']:
-                            try:
-                                parsed_date = datetime.strptime(date_text, date_format)
-                                now_bd = datetime.now(LOCAL_TIMEZONE)
-                                local_dt = parsed_date.replace(hour=now_bd.hour, minute=now_bd.minute, second=now_bd.second)
-                                aware_local_dt = local_dt.replace(tzinfo=LOCAL_TIMEZONE)
-                                pub_date = aware_local_dt.astimezone(timezone.utc)
-                                break
-                            except ValueError:
-                                continue
-                    
-                    # Fallback to current time if date parsing failed
-                    if pub_date is None:
-                        pub_date = datetime.now(timezone.utc)
-                    
-                    description = summary if summary else title
-                    
-                    logging.info(f"Found update from {source['name']}: Title='{title}', Link='{link}', Date='{pub_date}'")
-                    all_updates.append({
-                        'title': f"[{source['name']}] {title}",
-                        'link': link,
-                        'guid': guid,
-                        'is_permalink': is_permalink,
-                        'pub_date': pub_date,
-                        'description': description,
-                        'source': source['name']
-                    })
-                    
-                except Exception as e:
-                    logging.warning(f"Error processing update element from {source['name']}: {e}")
-                    continue
-                    
+            with METRICS.span('extract', source=source['name']) as span:
+                source_updates = extract_source_updates(soup, source)
+                span['items'] = len(source_updates)
+            METRICS.increment('items_extracted_total', len(source_updates), source=source['name'])
+            all_updates.extend(source_updates)
         except Exception as e:
             logging.error(f"Error parsing content from {source['name']}: {e}")
             continue
@@ -249,15 +376,14 @@ def fetch_metro_updates():
     # Add some default/static content if no updates are found
     if not all_updates:
         logging.info("No updates found from sources, adding default content")
-        default_update = {
-            'title': 'Dhaka Metro Timetable Available',
-            'link': FEED_LINK,
-            'guid': 'metro-timings-default',
-            'is_permalink': True,
-            'pub_date': datetime.now(timezone.utc),
-            'description': 'Check the latest Dhaka MRT-6 metro timetable and schedule information.',
-            'source': 'Metro Timings'
-        }
+        default_update = FeedItem(
+            'Dhaka Metro Timetable Available',
+            FEED_LINK,
+            'metro-timings-default',
+            datetime.now(timezone.utc),
+            'Check the latest Dhaka MRT-6 metro timetable and schedule information.',
+            is_permalink=True
+        )
         all_updates.append(default_update)
     
     logging.info(f"Total updates collected: {len(all_updates)}")
@@ -265,6 +391,7 @@ def fetch_metro_updates():
 
 def load_existing_feed_guids(filename):
     """Loads GUIDs from an existing RSS feed file."""
+    import xml.etree.ElementTree as ET
     existing_guids = set()
     if not os.path.exists(filename):
         logging.info(f"No existing feed file found at {filename}. Starting fresh.")
@@ -285,85 +412,115 @@ def load_existing_feed_guids(filename):
         logging.warning(f"File {filename} not found error during parsing. Starting fresh.")
     return existing_guids
 
-def generate_rss_feed(updates, existing_guids, filename):
-    """Generates and saves the RSS feed XML file."""
-    logging.info("Generating new RSS feed...")
-    root = ET.Element("rss", version="2.0", attrib={"xmlns:atom": "http://www.w3.org/2005/Atom"})
-    channel = ET.SubElement(root, "channel")
-
-    # GitHub Pages URL for the RSS feed
-    gh_pages_url = f"https://owais5514.github.io/Metro-timings/{filename}"
-    atom_link = ET.SubElement(channel, "atom:link", href=gh_pages_url, rel="self", type="application/rss+xml")
+def load_feed_items(filename):
+    """Loads the items of an existing feed file as FeedItems (newest first, as stored)."""
+    import xml.etree.ElementTree as ET
+    items = []
+    if not os.path.exists(filename):
+        return items
 
-    ET.SubElement(channel, "title").text = FEED_TITLE
-    ET.SubElement(channel, "link").text = FEED_LINK
-    ET.SubElement(channel, "description").text = FEED_DESCRIPTION
-    ET.SubElement(channel, "language").text = "en-US"
-    ET.SubElement(channel, "copyright").text = "Metro Timings"
-    ET.SubElement(channel, "lastBuildDate").text = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S %z")
-    ET.SubElement(channel, "generator").text = "Metro RSS Generator Script"
-    
-    # Add a version element that changes with each run
-    current_timestamp = datetime.now().strftime("%Y%m%d.%H%M%S")
-    ET.SubElement(channel, "version").text = f"1.0.{current_timestamp}"
+    logging.info(f"Loading old items from existing feed...")
+    try:
+        tree = ET.parse(filename)
+        old_root = tree.getroot()
+        for old_item in old_root.findall('./channel/item'):
+            guid_elem = old_item.find('guid')
+            if guid_elem is not None and guid_elem.text:
+                pub_date = datetime.now(timezone.utc)  # Default/Fallback
+                pub_date_elem = old_item.find('pubDate')
+                if pub_date_elem is not None and pub_date_elem.text:
+                    try:
+                        pub_date = datetime.strptime(pub_date_elem.text, "%a, %d %b %Y %H:%M:%S %z")
+                    except ValueError:
+                        try:
+                            pub_date = datetime.strptime(pub_date_elem.text, "%a, %d %b %Y %H:%M:%S").replace(tzinfo=timezone.utc)
+                        except ValueError:
+                            logging.warning(f"Could not parse old date '{pub_date_elem.text}' for GUID {guid_elem.text}. Using current time.")
+                try:
+                    items.append(FeedItem.from_feed_title(
+                        old_item.findtext('title') or '',
+                        old_item.findtext('link') or FEED_LINK,
+                        guid_elem.text,
+                        pub_date,
+                        old_item.findtext('description') or '',
+                        guid_elem.get('isPermaLink', 'false') == 'true'
+                    ))
+                except ValueError as e:
+                    logging.warning(f"Skipping invalid old item: {e}")
+    except (ET.ParseError, FileNotFoundError) as e:
+        logging.warning(f"Could not parse or find old feed to append items. Error: {e}.")
+    return items
 
+def merge_feed_items(updates, existing_guids, filename, old_items=None):
+    """Merges fetched updates with items from the existing feed file.
+    `old_items` already held in memory are used instead of re-parsing the file.
+    Returns the combined FeedItems sorted by publication date (newest first)."""
     combined_items_data = []
     new_items_added = 0
 
     for update in updates:
-        if update['guid'] not in existing_guids:
+        if update.guid not in existing_guids:
             combined_items_data.append(update)
             new_items_added += 1
 
     logging.info(f"Adding {new_items_added} new item(s) based on GUID comparison.")
 
-    # Add old items if we need to fill up to MAX_FEED_ITEMS
-    num_old_items_to_add = MAX_FEED_ITEMS - new_items_added
-    if num_old_items_to_add > 0 and os.path.exists(filename):
-        logging.info(f"Loading max {num_old_items_to_add} old items from existing feed...")
-        try:
-            tree = ET.parse(filename)
-            old_root = tree.getroot()
-            loaded_old_items = 0
-            for old_item in old_root.findall('./channel/item'):
-                guid_elem = old_item.find('guid')
-                if guid_elem is not None and guid_elem.text and guid_elem.text not in [item['guid'] for item in combined_items_data]:
-                    old_update_data = {
-                        'title': old_item.find('title').text if old_item.find('title') is not None else '',
-                        'link': old_item.find('link').text if old_item.find('link') is not None else FEED_LINK,
-                        'guid': guid_elem.text,
-                        'is_permalink': guid_elem.get('isPermaLink', 'false') == 'true',
-                        'description': old_item.find('description').text if old_item.find('description') is not None else '',
-                        'pub_date': datetime.now(timezone.utc)  # Default/Fallback
-                    }
-                    pub_date_elem = old_item.find('pubDate')
-                    if pub_date_elem is not None and pub_date_elem.text:
-                        try:
-                            old_update_data['pub_date'] = datetime.strptime(pub_date_elem.text, "%a, %d %b %Y %H:%M:%S %z")
-                        except ValueError:
-                            try:
-                                old_update_data['pub_date'] = datetime.strptime(pub_date_elem.text, "%a, %d %b %Y %H:%M:%S").replace(tzinfo=timezone.utc)
-                            except ValueError:
-                                logging.warning(f"Could not parse old date '{pub_date_elem.text}' for GUID {guid_elem.text}. Using current time.")
-                    combined_items_data.append(old_update_data)
-                    loaded_old_items += 1
-                    if loaded_old_items >= num_old_items_to_add:
-                        break
-            logging.info(f"Added {loaded_old_items} old items.")
-        except (ET.ParseError, FileNotFoundError) as e:
-            logging.warning(f"Could not parse or find old feed to append items. Error: {e}.")
+    # Carry over every item on the current page; overflow is moved to archive pages later
+    if old_items is None:
+        old_items = load_feed_items(filename)
+    combined_guids = {item.guid for item in combined_items_data}
+    loaded_old_items = 0
+    for old_item in old_items:
+        if old_item.guid not in combined_guids:
+            combined_items_data.append(old_item)
+            combined_guids.add(old_item.guid)
+            loaded_old_items += 1
+    logging.info(f"Added {loaded_old_items} old items.")
 
     logging.info(f"Sorting {len(combined_items_data)} combined items by publication date (newest first)...")
-    combined_items_data.sort(key=lambda x: x['pub_date'], reverse=True)
+    combined_items_data.sort(key=lambda x: x.published, reverse=True)
+    return combined_items_data
+
+def build_feed_xml(items, filename, build_id=None, links=(), archive=False):
+    """Renders FeedItems into pretty-printed RSS XML bytes.
+    `links` are extra (rel, path) atom:links; `archive` marks an RFC 5005 archive page."""
+    import xml.etree.ElementTree as ET
+    from xml.dom import minidom
+    namespaces = {"xmlns:atom": "http://www.w3.org/2005/Atom"}
+    if archive:
+        namespaces["xmlns:fh"] = FH_NAMESPACE
+    root = ET.Element("rss", version="2.0", attrib=namespaces)
+    channel = ET.SubElement(root, "channel")
+
+    # GitHub Pages URL for the RSS feed
+    if filename:
+        gh_pages_url = f"https://owais5514.github.io/Metro-timings/{filename}"
+        atom_link = ET.SubElement(channel, "atom:link", href=gh_pages_url, rel="self", type="application/rss+xml")
+    for rel, path in links:
+        ET.SubElement(channel, "atom:link", href=f"https://owais5514.github.io/Metro-timings/{path}", rel=rel,
+                      type="application/rss+xml")
+    if archive:
+        ET.SubElement(channel, "fh:archive")
+
+    ET.SubElement(channel, "title").text = FEED_TITLE
+    ET.SubElement(channel, "link").text = FEED_LINK
+    ET.SubElement(channel, "description").text = FEED_DESCRIPTION
+    ET.SubElement(channel, "language").text = "en-US"
+    ET.SubElement(channel, "copyright").text = "Metro Timings"
+    ET.SubElement(channel, "lastBuildDate").text = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S %z")
+    ET.SubElement(channel, "generator").text = "Metro RSS Generator Script"
+    
+    # Add a version element that changes with each run
+    ET.SubElement(channel, "version").text = f"1.0.{build_id or new_build_id()}"
 
     items_added_to_xml = 0
-    for item_data in combined_items_data[:MAX_FEED_ITEMS]:
+    for item_data in items:
         item = ET.SubElement(channel, "item")
-        ET.SubElement(item, "title").text = item_data['title']
-        ET.SubElement(item, "link").text = item_data['link']
-        ET.SubElement(item, "description").text = item_data['description']
-        ET.SubElement(item, "pubDate").text = item_data['pub_date'].strftime("%a, %d %b %Y %H:%M:%S %z")
-        ET.SubElement(item, "guid", isPermaLink=str(item_data['is_permalink']).lower()).text = item_data['guid']
+        ET.SubElement(item, "title").text = item_data.feed_title
+        ET.SubElement(item, "link").text = item_data.link
+        ET.SubElement(item, "description").text = item_data.description
+        ET.SubElement(item, "pubDate").text = item_data.pub_date.strftime("%a, %d %b %Y %H:%M:%S %z")
+        ET.SubElement(item, "guid", isPermaLink=str(item_data.is_permalink).lower()).text = item_data.guid
         items_added_to_xml += 1
 
     logging.info(f"Added {items_added_to_xml} total items to the feed XML.")
@@ -374,38 +531,154 @@ def generate_rss_feed(updates, existing_guids, filename):
     except Exception as parse_err:
         logging.warning(f"Could not prettify XML output using minidom. Error: {parse_err}. Saving raw XML.")
         pretty_xml_str = xml_str
+    return pretty_xml_str
+
+def generate_rss_feed(updates, existing_guids, filename, old_items=None):
+    """Generates and saves the RSS feed XML file.
+    Returns the items written to the current page, or None if the file could not be written."""
+    logging.info("Generating new RSS feed...")
+    with METRICS.span('merge') as span:
+        combined_items_data = merge_feed_items(updates, existing_guids, filename, old_items)
+        span['items'] = len(combined_items_data)
+    build_id = new_build_id()
+
+    def render_archive_page(items, prev_file):
+        links = [('current', filename)] + ([('prev-archive', prev_file)] if prev_file else [])
+        return build_feed_xml(items, None, build_id, links, archive=True)
+
+    with METRICS.span('archive') as span:
+        feed_items, latest_archive = archive_overflow(combined_items_data, MAX_FEED_ITEMS, render_archive_page)
+        span['archived'] = len(combined_items_data) - len(feed_items)
+    with METRICS.span('render'):
+        links = [('prev-archive', latest_archive)] if latest_archive else []
+        pretty_xml_str = build_feed_xml(feed_items, filename, build_id, links)
+
+    with METRICS.span('write') as span:
+        try:
+            with open(filename, "wb") as f:
+                f.write(pretty_xml_str)
+            span['bytes'] = len(pretty_xml_str)
+            logging.info(f"RSS feed successfully generated and saved to {filename}")
+        except IOError as e:
+            span['error'] = type(e).__name__
+            logging.error(f"Error writing RSS feed file {filename}: {e}")
+            return None
+
+    with METRICS.span('deltas') as span:
+        new_guids = {update.guid for update in updates if update.guid not in existing_guids}
+        try:
+            index = publish_deltas(feed_items, new_guids, build_id, filename,
+                                   lambda items, name: build_feed_xml(items, name, build_id))
+            span['deltas'] = len(index['deltas'])
+        except IOError as e:
+            span['error'] = type(e).__name__
+            logging.error(f"Error publishing delta feeds: {e}")
+
+    return feed_items
+
+def collapse_near_duplicates(updates, known_guids, index=None):
+    """Drops new updates that near-duplicate a published notice (e.g. the same announcement
+    on another site). Their GUIDs are added to `known_guids`. Returns the kept updates.
+    An `index` kept in memory between runs is used instead of re-reading the index file."""
+    from dedup import DEDUP_INDEX_FILE, NearDuplicateIndex
+
+    with METRICS.span('dedup') as span:
+        try:
+            if index is None:
+                index = NearDuplicateIndex.load(DEDUP_INDEX_FILE)
+                if index.needs_seeding:
+                    index.add_items(load_feed_items(RSS_FILENAME))
+            known_guids.update(index.duplicates)
+            span['evicted'] = index.prune()
+            indexed = len(index.fingerprints)
+            kept = index.collapse(updates, known_guids)
+            span['collapsed'] = len(updates) - len(kept)
+            if span['collapsed'] or span['evicted'] or len(index.fingerprints) != indexed:
+                index.save(DEDUP_INDEX_FILE)
+        except Exception as e:
+            span['error'] = type(e).__name__
+            logging.warning(f"Could not check for near-duplicate updates: {e}")
+            return updates
+    return kept
+
+def enrich_new_updates(updates, known_guids):
+    """Adds full notice text and attachment links from detail pages to updates with new GUIDs."""
+    from enrichment import enrich_updates
+
+    with METRICS.span('enrich') as span:
+        try:
+            span['cached'], span['downloaded'] = enrich_updates(updates, known_guids, METRICS)
+        except Exception as e:
+            span['error'] = type(e).__name__
+            logging.warning(f"Could not enrich updates from detail pages: {e}")
+
+def update_search_index(updates):
+    """Adds newly seen notices to the full-text search index. Returns the number added,
+    or None if the index could not be updated."""
+    from search_index import SEARCH_DB_FILE, index_updates, open_index
+
+    with METRICS.span('search_index') as span:
+        try:
+            conn = open_index(SEARCH_DB_FILE)
+            try:
+                added = index_updates(conn, updates)
+            finally:
+                conn.close()
+        except Exception as e:
+            span['error'] = type(e).__name__
+            logging.warning(f"Could not update search index: {e}")
+            return None
+        span['indexed'] = added
+    logging.info(f"Indexed {added} new notice(s) in {SEARCH_DB_FILE}")
+    return added
 
+def write_metrics(metrics_file, history_file, prometheus_file):
+    """Saves this run's metrics without letting a write failure fail the run."""
     try:
-        with open(filename, "wb") as f:
-            f.write(pretty_xml_str)
-        logging.info(f"RSS feed successfully generated and saved to {filename}")
+        METRICS.write(metrics_file, history_file, prometheus_file)
+        logging.info(f"Run metrics saved to {metrics_file}")
     except IOError as e:
-        logging.error(f"Error writing RSS feed file {filename}: {e}")
+        logging.warning(f"Could not save run metrics: {e}")
 
-if __name__ == "__main__":
+def run(args):
+    """Runs one feed generation pass. Returns the process exit code."""
     start_time = datetime.now()
     logging.info(f"Starting Metro updates RSS generation process...")
     logging.info(f"Local time: {start_time.strftime('%Y-%m-%d %H:%M:%S %Z%z')} (Timezone Offset: {LOCAL_TIMEZONE})")
     
     try:
         # Check for new content first
-        if not check_for_new_content():
+        pages = {}
+        with METRICS.span('change_check') as span:
+            changed_sources = check_for_new_content(pages=pages)
+            span['changed'] = len(changed_sources)
+        if not changed_sources:
             logging.info("No new content detected, skipping RSS generation")
-            sys.exit(0)
+            return 0
         
-        # Fetch updates
-        fetched_updates = fetch_metro_updates()
+        # Extract updates from the pages of the sources that changed
+        fetched_updates = fetch_metro_updates(changed_sources, pages)
 
         # Load existing GUIDs
-        current_guids = load_existing_feed_guids(RSS_FILENAME)
+        with METRICS.span('load_guids'):
+            current_guids = load_existing_feed_guids(RSS_FILENAME) | load_archived_guids()
+
+        # Same announcement posted on several sites: keep the first copy only
+        fetched_updates = collapse_near_duplicates(fetched_updates, current_guids)
+
+        # Fetch detail pages for new notices before they are indexed and published
+        enrich_new_updates(fetched_updates, current_guids)
+
+        # Index notices for search; only GUIDs not seen before are written
+        update_search_index(fetched_updates)
 
         # Determine if there are new updates by comparing fetched GUIDs to existing ones
         new_updates_found = False
         if fetched_updates:
             for update in fetched_updates:
-                if update['guid'] not in current_guids:
+                if update.guid not in current_guids:
                     new_updates_found = True
-                    logging.info(f"New update found: GUID {update['guid']} Title: {update['title']}")
+                    logging.info(f"New update found: GUID {update.guid} Title: {update.feed_title}")
                     break
 
         # Generate feed ONLY if new updates were found
@@ -421,6 +694,29 @@ if __name__ == "__main__":
 
         end_time = datetime.now()
         logging.info(f"Process finished. Duration: {end_time - start_time}")
+        return 0
     except Exception as e:
         logging.error(f"Unexpected error during execution: {e}", exc_info=True)
-        sys.exit(1)
+        return 1
+    finally:
+        write_metrics(args.metrics_file, args.metrics_history, args.prometheus)
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the Metro updates RSS feed')
+    parser.add_argument('--metrics-file', default=METRICS_FILE, help='Where to write this run\'s metrics JSON')
+    parser.add_argument('--metrics-history', default=METRICS_HISTORY_FILE, help='JSON-lines history of run metrics')
+    parser.add_argument('--prometheus', help='Also write metrics in Prometheus text format to this file')
+    parser.add_argument('--daemon', action='store_true', help='Keep running and regenerate on an internal schedule')
+    parser.add_argument('--interval', type=float, default=DAEMON_INTERVAL_SECONDS,
+                        help='Seconds between daemon cycles')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.daemon:
+        from daemon import run_daemon
+        return run_profiled(lambda: run_daemon(args), args, 'generate_metro_rss_daemon')
+    return run_profiled(lambda: run(args), args, 'generate_metro_rss')
+
+if __name__ == "__main__":
+    sys.exit(main())
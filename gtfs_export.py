@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+GTFS export for Metro Timings
+Rebuilds trips from the per-station departure lists of every line and
+service variant, and streams them as GTFS CSV files into a zip archive.
+Trips are generated one at a time, so memory holds a single trip instead
+of the whole stop_times table
+"""
+
+import argparse
+import csv
+import io
+import logging
+import sys
+import zipfile
+from bisect import bisect_left
+from datetime import date, timedelta
+
+from network import Network
+
+AGENCY = {
+    'agency_id': 'DMTCL',
+    'agency_name': 'Dhaka Mass Transit Company Limited',
+    'agency_url': 'https://dmtcl.gov.bd',
+    'agency_timezone': 'Asia/Dhaka'
+}
+ROUTE_TYPE_METRO = 1
+MAX_HOP_MINUTES = 15        # Longest plausible run between two consecutive stations
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_OUTPUT = "mrt-gtfs.zip"
+DEFAULT_VALID_DAYS = 365
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+# Mirrors query_server.service_variant: Friday and Saturday have their own timetables
+DAY_VARIANTS = {'friday': 'friday', 'saturday': 'saturday'}
+
+def service_id(line, variant):
+    return f"MRT-{line.id}-{variant}"
+
+def route_id(line):
+    return f"MRT-{line.id}"
+
+def gtfs_time(minutes):
+    """Formats minutes after service-day midnight as GTFS HH:MM:SS (hours may pass 24)."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+def stop_order(index, terminus_id):
+    """Stations departing towards `terminus_id`, in running order (earliest first departure first)."""
+    return sorted((station_id for station_id, directions in index.items() if directions.get(terminus_id)),
+                  key=lambda station_id: (index[station_id][terminus_id][0], station_id))
+
+def next_departure(minutes, used, after):
+    """Index of the first unused departure within MAX_HOP_MINUTES of `after` (wrapping past midnight), or None."""
+    position = bisect_left(minutes, after % MINUTES_PER_DAY)
+    for step in range(len(minutes)):
+        i = (position + step) % len(minutes)
+        if (minutes[i] - after) % MINUTES_PER_DAY > MAX_HOP_MINUTES:
+            return None
+        if not used[i]:
+            return i
+    return None
+
+def reconstruct_trips(index, terminus_id):
+    """Yields each trip towards `terminus_id` as [(station_id, minutes), ...].
+
+    Trains don't overtake, so a departure continues with the first unused
+    departure at the next station within MAX_HOP_MINUTES. Departures left
+    unused by earlier stations start trips of their own (short workings).
+    """
+    order = stop_order(index, terminus_id)
+    times = [index[station_id][terminus_id] for station_id in order]
+    used = [bytearray(len(minutes)) for minutes in times]
+    for start in range(len(order)):
+        for first in range(len(times[start])):
+            if used[start][first]:
+                continue
+            used[start][first] = 1
+            current = times[start][first]
+            trip = [(order[start], current)]
+            for stop in range(start + 1, len(order)):
+                i = next_departure(times[stop], used[stop], current)
+                if i is None:
+                    break
+                used[stop][i] = 1
+                current += (times[stop][i] - current) % MINUTES_PER_DAY
+                trip.append((order[stop], current))
+            yield trip
+
+def line_trips(line, variant, warn=True):
+    """Yields (trip_id, terminus_id, direction_id, stop times) for one line variant.
+    Departures no other station continues can't form a GTFS trip and are skipped."""
+    index = line.index(variant)
+    termini = sorted({terminus_id for directions in index.values() for terminus_id in directions})
+    for terminus_id in termini:
+        # GTFS only knows two directions; lines with short-working termini leave it blank
+        direction_id = termini.index(terminus_id) if len(termini) == 2 else ''
+        number = skipped = 0
+        for trip in reconstruct_trips(index, terminus_id):
+            if len(trip) < 2:
+                skipped += 1
+                continue
+            number += 1
+            yield f"{service_id(line, variant)}-{terminus_id}-{number:04d}", terminus_id, direction_id, trip
+        if skipped and warn:
+            logging.warning(f"Skipped {skipped} single-stop departure(s) towards "
+                            f"{line.network.station_name(terminus_id)} on MRT Line {line.id} {variant}")
+
+def calendar_days(line, variant):
+    """GTFS day flags for the days `variant` runs on this line (missing variants fall back to weekday)."""
+    return [1 if line.resolve_variant(DAY_VARIANTS.get(day, 'weekday')) == variant else 0 for day in WEEKDAYS]
+
+def stations_missing_coordinates(metro_network, services):
+    """Names of served stations without 'lat'/'lon' in the registry; GTFS requires both for every stop."""
+    served = {station_id for line, variant in services for station_id in line.index(variant)}
+    return sorted(metro_network.station_name(station_id) for station_id in served
+                  if metro_network.stations[station_id].get('lat') is None
+                  or metro_network.stations[station_id].get('lon') is None)
+
+def open_csv(archive, name, header):
+    """Opens a zip member for streaming CSV rows. Returns (writer, text stream)."""
+    stream = io.TextIOWrapper(archive.open(name, 'w'), encoding='utf-8', newline='')
+    writer = csv.writer(stream, lineterminator='\n')
+    writer.writerow(header)
+    return writer, stream
+
+def export_gtfs(metro_network, output=DEFAULT_OUTPUT, start=None, days=DEFAULT_VALID_DAYS):
+    """Writes the GTFS feed for every line. Returns {'trips': n, 'stop_times': n}.
+    Raises ValueError, before anything is written, if a served station has no coordinates."""
+    start = start or date.today()
+    end = start + timedelta(days=days - 1)
+    services = [(line, variant) for line in metro_network.lines.values() for variant in line.variants
+                if any(calendar_days(line, variant))]
+    missing = stations_missing_coordinates(metro_network, services)
+    if missing:
+        raise ValueError(f"No coordinates for {', '.join(missing)}; add surveyed 'lat' and 'lon' (e.g. from "
+                         f"each station's OpenStreetMap node) to their entries in {metro_network.registry_file}")
+    counts = {'trips': 0, 'stop_times': 0}
+
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        writer, stream = open_csv(archive, 'agency.txt', list(AGENCY))
+        writer.writerow(AGENCY.values())
+        stream.close()
+
+        writer, stream = open_csv(archive, 'routes.txt',
+                                  ['route_id', 'agency_id', 'route_short_name', 'route_long_name', 'route_type'])
+        for line in metro_network.lines.values():
+            writer.writerow([route_id(line), AGENCY['agency_id'], f"MRT-{line.id}", f"MRT Line {line.id}",
+                             ROUTE_TYPE_METRO])
+        stream.close()
+
+        writer, stream = open_csv(archive, 'calendar.txt',
+                                  ['service_id', *WEEKDAYS, 'start_date', 'end_date'])
+        for line, variant in services:
+            writer.writerow([service_id(line, variant), *calendar_days(line, variant),
+                             start.strftime('%Y%m%d'), end.strftime('%Y%m%d')])
+        stream.close()
+
+        # Only one zip member can be open at a time, so the trips are rebuilt for stop_times.txt
+        # rather than held in memory
+        writer, stream = open_csv(archive, 'trips.txt',
+                                  ['route_id', 'service_id', 'trip_id', 'trip_headsign', 'direction_id'])
+        for line, variant in services:
+            for trip_id, terminus_id, direction_id, _ in line_trips(line, variant):
+                writer.writerow([route_id(line), service_id(line, variant), trip_id,
+                                 metro_network.station_name(terminus_id), direction_id])
+                counts['trips'] += 1
+        stream.close()
+
+        writer, stream = open_csv(archive, 'stop_times.txt',
+                                  ['trip_id', 'arrival_time', 'departure_time', 'stop_id', 'stop_sequence'])
+        for line, variant in services:
+            for trip_id, _, _, trip in line_trips(line, variant, warn=False):
+                for sequence, (station_id, minutes) in enumerate(trip, 1):
+                    writer.writerow([trip_id, gtfs_time(minutes), gtfs_time(minutes), station_id, sequence])
+                counts['stop_times'] += len(trip)
+        stream.close()
+
+        writer, stream = open_csv(archive, 'stops.txt', ['stop_id', 'stop_name', 'stop_lat', 'stop_lon'])
+        for station_id in sorted(metro_network.stations):
+            station = metro_network.stations[station_id]
+            if station.get('lat') is None or station.get('lon') is None:
+                continue  # Registered but served by no exported line
+            writer.writerow([station_id, station['name'], station['lat'], station['lon']])
+        stream.close()
+
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the metro timetables as a GTFS feed')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='GTFS zip file to write')
+    parser.add_argument('--start', type=date.fromisoformat, help='First service date, YYYY-MM-DD (default: today)')
+    parser.add_argument('--days', type=int, default=DEFAULT_VALID_DAYS, help='Number of days the feed is valid')
+    args = parser.parse_args()
+
+    metro_network = Network()
+    try:
+        counts = export_gtfs(metro_network, args.output, args.start, args.days)
+    except ValueError as e:
+        print(f"❌ Not exporting an invalid GTFS feed: {e}")
+        return 1
+    if metro_network.dirty:
+        logging.warning("Timetables contain stations missing from the registry; run `python network.py sync`")
+    print(f"🚆 Wrote {args.output}: {len(metro_network.lines)} lines, {len(metro_network.stations)} stops, "
+          f"{counts['trips']} trips, {counts['stop_times']} stop times")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,9 +10,15 @@ import json
 import os
 import sys
 import logging
+import argparse
 from datetime import datetime, timezone, timedelta
 from email.utils import parsedate_to_datetime
 
+from health_history import print_summary, record_health_report
+from metrics import METRICS_HISTORY_FILE, load_history, percentile, span_durations
+from profiling import add_profile_arguments, run_profiled
+from replay import resolve_url
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -25,6 +31,7 @@ RSS_FILE = "metro_feed.xml"
 CACHE_FILE = "metro_cache.json"
 LOG_FILE = "metro_rss_generator.log"
 HEALTH_REPORT_FILE = "health_report.json"
+METRICS_TREND_WINDOW = 10  # Recent runs compared against the older history
 
 def check_local_files():
     """Check if required local files exist and are readable."""
@@ -160,9 +167,10 @@ def check_remote_accessibility():
             'Accept': 'application/rss+xml, application/xml, text/xml'
         }
         
-        response = requests.get(RSS_URL, headers=headers, timeout=15)
+        response = requests.get(resolve_url(RSS_URL), headers=headers, timeout=15)
         
-        print(f"📡 HTTP Status: {response.status_code}")
+        latency = response.elapsed.total_seconds()
+        print(f"📡 HTTP Status: {response.status_code} ({latency:.2f}s)")
         print(f"📏 Content Length: {len(response.content)} bytes")
         print(f"📋 Content Type: {response.headers.get('content-type', 'Not specified')}")
         
@@ -192,6 +200,7 @@ def check_remote_accessibility():
                     'accessible': True,
                     'status_code': response.status_code,
                     'content_length': len(response.content),
+                    'latency_s': round(latency, 3),
                     'remote_item_count': len(remote_items) if 'remote_items' in locals() else 0
                 }
                 
@@ -201,7 +210,7 @@ def check_remote_accessibility():
                 
         else:
             print(f"❌ Remote feed returned status {response.status_code}")
-            return {'accessible': False, 'status_code': response.status_code}
+            return {'accessible': False, 'status_code': response.status_code, 'latency_s': round(latency, 3)}
             
     except requests.exceptions.Timeout:
         print("❌ Request timeout - remote feed not accessible")
@@ -232,14 +241,24 @@ def check_cache_status():
             hours_since_check = (datetime.now(timezone.utc) - last_check).total_seconds() / 3600
             print(f"🕐 Last check: {last_check} ({hours_since_check:.1f} hours ago)")
         
-        if 'content_hash' in cache_data:
-            print(f"🔑 Content hash: {cache_data['content_hash'][:8]}...")
-        
+        schedules = {}
+        for name, schedule in cache_data.get('sources', {}).items():
+            status = f"⚠️  {schedule['failures']} failed poll(s)" if schedule.get('failures') else "🔄"
+            print(f"{status} {name}: polled every {schedule['interval'] / 3600:.1f}h, "
+                  f"next check {schedule.get('next_check')}")
+            schedules[name] = {
+                'interval_hours': round(schedule['interval'] / 3600, 2),
+                'next_check': schedule.get('next_check'),
+                'last_change': schedule.get('last_change'),
+                'failures': schedule.get('failures', 0)
+            }
+
         return {
             'cache_exists': True,
             'last_check': cache_data.get('last_check'),
             'hours_since_check': hours_since_check if 'hours_since_check' in locals() else None,
-            'has_content_hash': 'content_hash' in cache_data
+            'has_content_hash': any(s.get('content_hash') for s in cache_data.get('sources', {}).values()),
+            'poll_schedules': schedules
         }
         
     except json.JSONDecodeError as e:
@@ -308,6 +327,56 @@ def check_recent_logs():
         print(f"❌ Log check error: {e}")
         return {'log_exists': True, 'error': str(e)}
 
+def check_pipeline_metrics():
+    """Trend per-stage timings recorded by the generator across runs."""
+    print("\n⏱️  Checking pipeline metrics...")
+    
+    runs = load_history(METRICS_HISTORY_FILE)
+    if not runs:
+        print("⚠️  No metrics history found - this is normal before the first instrumented run")
+        return {'metrics_exist': False}
+    
+    print(f"📄 Metrics history has {len(runs)} runs")
+    
+    sources = {}
+    for source, durations in sorted(span_durations(runs, 'fetch', phase='update').items()):
+        sources[source] = {
+            'samples': len(durations),
+            'p50_s': percentile(durations, 50),
+            'p95_s': percentile(durations, 95),
+            'max_s': max(durations)
+        }
+        print(f"📡 {source}: p50={sources[source]['p50_s']:.2f}s "
+              f"p95={sources[source]['p95_s']:.2f}s max={sources[source]['max_s']:.2f}s "
+              f"({len(durations)} fetches)")
+    
+    run_durations = [run['duration_s'] for run in runs if 'duration_s' in run]
+    recent = run_durations[-METRICS_TREND_WINDOW:]
+    older = run_durations[:-METRICS_TREND_WINDOW]
+    trend = None
+    if recent and older:
+        recent_p50 = percentile(recent, 50)
+        older_p50 = percentile(older, 50)
+        trend = (recent_p50 - older_p50) / older_p50 if older_p50 else None
+        if trend is not None:
+            print(f"📈 Run duration p50: {older_p50:.2f}s -> {recent_p50:.2f}s ({trend:+.0%})")
+    
+    parse_p95 = {
+        source: percentile(durations, 95)
+        for source, durations in sorted(span_durations(runs, 'parse').items())
+    }
+    
+    return {
+        'metrics_exist': True,
+        'run_count': len(runs),
+        'last_run': runs[-1].get('timestamp'),
+        'last_run_duration_s': run_durations[-1] if run_durations else None,
+        'run_duration_p95_s': percentile(run_durations, 95),
+        'run_duration_trend': trend,
+        'fetch_latency_by_source': sources,
+        'parse_p95_by_source': parse_p95
+    }
+
 def generate_health_report():
     """Generate a comprehensive health report."""
     print("\n🏥 Generating comprehensive health report...")
@@ -324,6 +393,7 @@ def generate_health_report():
     report['checks']['remote_access'] = check_remote_accessibility()
     report['checks']['cache_status'] = check_cache_status()
     report['checks']['recent_logs'] = check_recent_logs()
+    report['checks']['pipeline_metrics'] = check_pipeline_metrics()
     
     # Determine overall health
     critical_issues = 0
@@ -351,6 +421,14 @@ def generate_health_report():
     else:
         report['overall_health'] = 'unhealthy'
     
+    # Append to the history so freshness, latency and error rates can be trended
+    try:
+        report['history'] = record_health_report(report)
+        print("\n📈 Health history:")
+        print_summary(report['history'])
+    except Exception as e:
+        print(f"⚠️  Could not record health history: {e}")
+    
     # Save report
     try:
         with open(HEALTH_REPORT_FILE, 'w') as f:
@@ -361,7 +439,7 @@ def generate_health_report():
     
     return report
 
-def main():
+def run_health_check():
     print("🚇 Metro RSS Feed Health Check")
     print("=" * 50)
     
@@ -400,5 +478,12 @@ def main():
     
     return exit_code
 
+def main():
+    parser = argparse.ArgumentParser(description='Check the health of the Metro RSS feed system')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    
+    return run_profiled(run_health_check, args, 'health_check')
+
 if __name__ == "__main__":
     sys.exit(main())
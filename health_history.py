@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Health history for the Metro RSS Feed System
+Appends one fixed-width record per health check to a binary log and keeps
+rolling 24h/7d aggregates (uptime, remote p95 latency, feed staleness,
+error rate) up to date incrementally, so dashboards and alerts read a
+small JSON summary instead of rescanning the history
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+HEALTH_HISTORY_FILE = "health_history.bin"
+HEALTH_AGGREGATES_FILE = "health_aggregates.json"
+WINDOWS = {'24h': 24 * 60 * 60, '7d': 7 * 24 * 60 * 60}
+# Remote latency histogram: upper bounds from 50 ms growing 25% per bucket (~5 min), plus an overflow bucket
+LATENCY_BUCKETS = [round(0.05 * 1.25 ** i, 4) for i in range(40)]
+STATUSES = ['healthy', 'healthy_with_warnings', 'unhealthy', 'unknown']
+REMOTE_CHECKED = 1
+REMOTE_ACCESSIBLE = 2
+
+# timestamp, status, remote flags, remote latency (s), feed staleness (h), recent log errors, feed items
+RECORD = struct.Struct('<dBBffHI')
+HealthRecord = namedtuple('HealthRecord', 'timestamp status flags latency_s staleness_h errors items')
+
+def record_from_report(report, timestamp=None):
+    """Condenses a health report into a fixed-width record. Unknown measurements are NaN."""
+    checks = report['checks']
+    remote = checks.get('remote_access', {})
+    rss = checks.get('rss_health', {})
+    flags = 0
+    if remote:
+        flags |= REMOTE_CHECKED
+    if remote.get('accessible'):
+        flags |= REMOTE_ACCESSIBLE
+    latency = remote.get('latency_s')
+    staleness = rss.get('hours_since_build')
+    status = report.get('overall_health')
+    return HealthRecord(
+        timestamp if timestamp is not None else time.time(),
+        STATUSES.index(status) if status in STATUSES else STATUSES.index('unknown'),
+        flags,
+        latency if latency is not None else math.nan,
+        staleness if staleness is not None else math.nan,
+        min(checks.get('recent_logs', {}).get('recent_errors', 0), 0xFFFF),
+        rss.get('item_count', 0)
+    )
+
+def histogram_percentile(counts, pct):
+    """Upper bound of the latency bucket holding the `pct` percentile, or None if empty."""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = math.ceil(total * pct / 100)
+    seen = 0
+    for i, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            return LATENCY_BUCKETS[min(i, len(LATENCY_BUCKETS) - 1)]
+    return LATENCY_BUCKETS[-1]
+
+class RollingWindow:
+    """Sums over the records of the last `seconds`; records are added at the head and removed at the tail."""
+
+    def __init__(self, seconds, state=None):
+        self.seconds = seconds
+        self.state = state or {
+            'tail': 0,  # Index of the oldest record still in the window
+            'count': 0,
+            'up': 0,
+            'remote_checks': 0,
+            'remote_ok': 0,
+            'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+            'staleness_sum': 0.0,
+            'staleness_count': 0,
+            'staleness_peaks': [],  # [record index, hours] with decreasing hours: the front is the window max
+            'error_runs': 0
+        }
+
+    def apply(self, record, index, sign):
+        """Adds (sign=1) or removes (sign=-1) the contribution of record number `index`."""
+        state = self.state
+        state['count'] += sign
+        if STATUSES[record.status] in ('healthy', 'healthy_with_warnings'):
+            state['up'] += sign
+        if record.flags & REMOTE_CHECKED:
+            state['remote_checks'] += sign
+        if record.flags & REMOTE_ACCESSIBLE:
+            state['remote_ok'] += sign
+        if not math.isnan(record.latency_s):
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if record.latency_s <= bound),
+                          len(LATENCY_BUCKETS))
+            state['latency_buckets'][bucket] += sign
+        if not math.isnan(record.staleness_h):
+            state['staleness_sum'] += sign * record.staleness_h
+            state['staleness_count'] += sign
+            peaks = state['staleness_peaks']
+            if sign > 0:
+                while peaks and peaks[-1][1] <= record.staleness_h:
+                    peaks.pop()
+                peaks.append([index, record.staleness_h])
+            elif peaks and peaks[0][0] == index:
+                peaks.pop(0)
+        if record.errors:
+            state['error_runs'] += sign
+        if not state['staleness_count']:
+            state['staleness_sum'] = 0.0  # Clears float drift from repeated subtraction
+
+    def summary(self):
+        state = self.state
+        count = state['count']
+        return {
+            'checks': count,
+            'uptime': round(state['up'] / count, 4) if count else None,
+            'remote_availability': (round(state['remote_ok'] / state['remote_checks'], 4)
+                                    if state['remote_checks'] else None),
+            'remote_latency_p95_s': histogram_percentile(state['latency_buckets'], 95),
+            'mean_staleness_h': (round(state['staleness_sum'] / state['staleness_count'], 2)
+                                 if state['staleness_count'] else None),
+            'max_staleness_h': round(state['staleness_peaks'][0][1], 2) if state['staleness_peaks'] else None,
+            'error_rate': round(state['error_runs'] / count, 4) if count else None
+        }
+
+class HealthHistory:
+    """The append-only record log plus its rolling window aggregates."""
+
+    def __init__(self, history_file=HEALTH_HISTORY_FILE, aggregates_file=HEALTH_AGGREGATES_FILE):
+        self.history_file = history_file
+        self.aggregates_file = aggregates_file
+        self.records = 0
+        self.latest = None
+        self.windows = {name: RollingWindow(seconds) for name, seconds in WINDOWS.items()}
+
+    @classmethod
+    def load(cls, history_file=HEALTH_HISTORY_FILE, aggregates_file=HEALTH_AGGREGATES_FILE):
+        """Loads the saved aggregates, rebuilding them from the log if they don't match it."""
+        history = cls(history_file, aggregates_file)
+        records = history.stored_records()
+        try:
+            with open(aggregates_file, 'r') as f:
+                data = json.load(f)
+            if (data.get('record_size') != RECORD.size or data.get('records') != records
+                    or data.get('latency_buckets') != LATENCY_BUCKETS
+                    or set(data.get('windows', {})) != set(WINDOWS)):
+                raise ValueError("aggregates are out of date")
+        except (OSError, ValueError) as e:
+            if records:
+                logging.info(f"Rebuilding health aggregates from {history_file} ({e})")
+            return history.rebuild()
+        history.records = records
+        history.latest = data.get('latest')
+        history.windows = {name: RollingWindow(seconds, data['windows'][name]) for name, seconds in WINDOWS.items()}
+        return history
+
+    def stored_records(self):
+        """Number of complete records in the log (a torn trailing write is ignored)."""
+        try:
+            return os.path.getsize(self.history_file) // RECORD.size
+        except OSError:
+            return 0
+
+    def read_record(self, f, index):
+        f.seek(index * RECORD.size)
+        return HealthRecord._make(RECORD.unpack(f.read(RECORD.size)))
+
+    def rebuild(self):
+        """Replays the whole log into fresh aggregates."""
+        self.records = 0
+        self.latest = None
+        self.windows = {name: RollingWindow(seconds) for name, seconds in WINDOWS.items()}
+        if not os.path.exists(self.history_file):
+            return self
+        with open(self.history_file, 'rb') as f:
+            for index in range(self.stored_records()):
+                self.add(self.read_record(f, index), f)
+        return self
+
+    def add(self, record, f):
+        """Counts a record already in the log and expires records that fell out of each window."""
+        self.records += 1
+        self.latest = {
+            'timestamp': datetime.fromtimestamp(record.timestamp, timezone.utc).isoformat(),
+            'status': STATUSES[record.status],
+            'remote_latency_s': None if math.isnan(record.latency_s) else round(record.latency_s, 3),
+            'staleness_h': None if math.isnan(record.staleness_h) else round(record.staleness_h, 2),
+            'recent_errors': record.errors,
+            'items': record.items
+        }
+        for window in self.windows.values():
+            window.apply(record, self.records - 1, 1)
+            state = window.state
+            # Each record is expired once per window, so appends stay O(1) amortised
+            while state['tail'] < self.records - 1:
+                oldest = self.read_record(f, state['tail'])
+                if oldest.timestamp > record.timestamp - window.seconds:
+                    break
+                window.apply(oldest, state['tail'], -1)
+                state['tail'] += 1
+
+    def append(self, record):
+        """Appends a record to the log and updates the aggregates."""
+        size = self.records * RECORD.size
+        mode = 'r+b' if os.path.exists(self.history_file) else 'w+b'
+        with open(self.history_file, mode) as f:
+            f.truncate(size)  # Drops a torn record left by an interrupted write
+            f.seek(size)
+            f.write(RECORD.pack(*record))
+            f.flush()
+            self.add(record, f)
+
+    def summary(self):
+        return {
+            'records': self.records,
+            'latest': self.latest,
+            **{name: window.summary() for name, window in self.windows.items()}
+        }
+
+    def save(self):
+        """Writes the aggregates (and a ready-made summary) atomically."""
+        data = {
+            'record_size': RECORD.size,
+            'records': self.records,
+            'latency_buckets': LATENCY_BUCKETS,
+            'latest': self.latest,
+            'windows': {name: window.state for name, window in self.windows.items()},
+            'summary': self.summary()
+        }
+        with open(f"{self.aggregates_file}.tmp", 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(f"{self.aggregates_file}.tmp", self.aggregates_file)
+
+def record_health_report(report, history_file=HEALTH_HISTORY_FILE, aggregates_file=HEALTH_AGGREGATES_FILE):
+    """Appends a health report to the history. Returns the updated summary."""
+    history = HealthHistory.load(history_file, aggregates_file)
+    history.append(record_from_report(report))
+    history.save()
+    return history.summary()
+
+def load_summary(aggregates_file=HEALTH_AGGREGATES_FILE):
+    """Reads the saved summary without touching the record log, or None if there is none."""
+    try:
+        with open(aggregates_file, 'r') as f:
+            return json.load(f).get('summary')
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def print_summary(summary):
+    latest = summary['latest'] or {}
+    print(f"📄 {summary['records']} health checks recorded, latest {latest.get('timestamp')} "
+          f"({latest.get('status')})")
+    for name in WINDOWS:
+        window = summary[name]
+        if not window['checks']:
+            print(f"  {name}: no checks")
+            continue
+        uptime = f"{window['uptime']:.1%}"
+        latency = f"{window['remote_latency_p95_s']}s" if window['remote_latency_p95_s'] is not None else 'n/a'
+        print(f"  {name}: uptime {uptime}, remote p95 <= {latency}, "
+              f"staleness mean {window['mean_staleness_h']}h max {window['max_staleness_h']}h, "
+              f"error rate {window['error_rate']:.1%} ({window['checks']} checks)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Show rolling health aggregates of the Metro RSS system')
+    parser.add_argument('--history', default=HEALTH_HISTORY_FILE, help='Health record log')
+    parser.add_argument('--aggregates', default=HEALTH_AGGREGATES_FILE, help='Rolling aggregates file')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute the aggregates from the record log')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+
+    if args.rebuild:
+        history = HealthHistory(args.history, args.aggregates).rebuild()
+        history.save()
+        summary = history.summary()
+    else:
+        summary = load_summary(args.aggregates)
+    if summary is None:
+        print(f"⚠️  No health aggregates in {args.aggregates}")
+        return 1
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Lightweight metrics for the Metro RSS pipeline
+Records timed spans and counters for a run and writes them as JSON,
+an append-only run history and optionally Prometheus text format
+"""
+
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+METRICS_FILE = "metro_metrics.json"
+METRICS_HISTORY_FILE = "metro_metrics_history.jsonl"
+MAX_HISTORY_RUNS = 500
+PROMETHEUS_PREFIX = "metro"
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{k}="{_escape_label_value(v)}"' for k, v in sorted(labels.items()))
+    return '{' + pairs + '}'
+
+class Metrics:
+    """Collects spans and counters for a single pipeline run."""
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Times the enclosed block. Yields a dict for extra attributes (bytes, status, ...)."""
+        attrs = {}
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except Exception as e:
+            attrs.setdefault('error', type(e).__name__)
+            raise
+        finally:
+            self.spans.append({
+                'name': name,
+                'labels': labels,
+                'start_offset_s': round(start - self._start, 6),
+                'duration_s': round(time.perf_counter() - start, 6),
+                **attrs
+            })
+
+    def increment(self, name, value=1, **labels):
+        """Adds `value` to the counter `name` with the given labels."""
+        key = (name, _label_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def to_dict(self):
+        """Returns the run's metrics as a JSON-serialisable dict."""
+        return {
+            'timestamp': self.started_at.isoformat(),
+            'duration_s': round(time.perf_counter() - self._start, 6),
+            'spans': self.spans,
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+        }
+
+    def to_prometheus(self):
+        """Renders span durations and counters in Prometheus text exposition format."""
+        durations = {}
+        for span in self.spans:
+            labels = {'stage': span['name'], **span['labels']}
+            key = _label_key(labels)
+            durations[key] = durations.get(key, 0.0) + span['duration_s']
+
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_duration_seconds Time spent in each pipeline stage",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_duration_seconds gauge"
+        ]
+        for key, value in sorted(durations.items()):
+            lines.append(f"{PROMETHEUS_PREFIX}_stage_duration_seconds{_format_labels(dict(key))} {value:.6f}")
+
+        names = sorted({name for name, _ in self.counters})
+        for name in names:
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} counter")
+            for (counter_name, labels), value in sorted(self.counters.items()):
+                if counter_name == name:
+                    lines.append(f"{PROMETHEUS_PREFIX}_{name}{_format_labels(dict(labels))} {value}")
+
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_run_duration_seconds gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}_run_duration_seconds {time.perf_counter() - self._start:.6f}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, metrics_file=METRICS_FILE, history_file=METRICS_HISTORY_FILE, prometheus_file=None):
+        """Writes the run's metrics, appends them to the history and optionally a .prom file."""
+        document = self.to_dict()
+        with open(metrics_file, 'w') as f:
+            json.dump(document, f, indent=2)
+
+        if history_file:
+            append_history(history_file, document)
+
+        if prometheus_file:
+            with open(prometheus_file, 'w') as f:
+                f.write(self.to_prometheus())
+
+def append_history(history_file, document, max_runs=MAX_HISTORY_RUNS):
+    """Appends a run to the JSON-lines history, keeping only the last `max_runs` runs."""
+    with open(history_file, 'a') as f:
+        f.write(json.dumps(document, separators=(',', ':')) + '\n')
+
+    with open(history_file, 'r') as f:
+        lines = f.readlines()
+    if len(lines) > max_runs:
+        with open(history_file, 'w') as f:
+            f.writelines(lines[-max_runs:])
+
+def load_history(history_file=METRICS_HISTORY_FILE):
+    """Loads all runs from the history file, skipping corrupt lines."""
+    runs = []
+    if not os.path.exists(history_file):
+        return runs
+    with open(history_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                runs.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return runs
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (pct in 0-100). Returns None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def span_durations(runs, name, label='source', **filters):
+    """Groups durations of spans called `name` across runs by the value of `label`.
+    Keyword filters restrict the spans to those with matching label values."""
+    grouped = {}
+    for run in runs:
+        for span in run.get('spans', []):
+            if span.get('name') != name:
+                continue
+            labels = span.get('labels', {})
+            if any(labels.get(k) != v for k, v in filters.items()):
+                continue
+            grouped.setdefault(labels.get(label, 'all'), []).append(span['duration_s'])
+    return grouped
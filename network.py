@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Metro network registry for Metro Timings
+Discovers line timetables by file name (mrt-<line>[-<variant>].json), gives
+every station a stable integer ID shared by all lines serving it, and loads
+a line's timetables only when it is first queried
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+
+import timetable
+
+LINE_FILE_PATTERN = re.compile(r'^mrt-(?P<line>\d+[a-z]?)(?:-(?P<suffix>[a-z]+))?\.json$')
+VARIANT_SUFFIXES = {
+    None: 'weekday',
+    'fri': 'friday',
+    'sat': 'saturday'
+}
+DEFAULT_VARIANT = 'weekday'
+STATION_REGISTRY_FILE = "stations.json"
+
+def discover_lines(directory='.'):
+    """Finds timetable files by naming convention. Returns {line: {variant: filename}}."""
+    lines = {}
+    for name in sorted(os.listdir(directory)):
+        match = LINE_FILE_PATTERN.match(name)
+        if not match:
+            continue
+        variant = VARIANT_SUFFIXES.get(match.group('suffix'), match.group('suffix'))
+        lines.setdefault(match.group('line'), {})[variant] = os.path.normpath(os.path.join(directory, name))
+    return lines
+
+def line_sort_key(line):
+    number = re.match(r'\d+', line)
+    return (int(number.group()), line)
+
+class Line:
+    """One metro line. Timetables are read and indexed on first use, per variant."""
+
+    def __init__(self, network, line_id, files):
+        self.network = network
+        self.id = line_id
+        self.files = files
+        self._indexes = {}
+
+    @property
+    def variants(self):
+        return list(self.files)
+
+    def resolve_variant(self, variant):
+        """The variant to use, falling back to the weekday timetable when the line has no such file."""
+        return variant if variant in self.files else DEFAULT_VARIANT
+
+    def index(self, variant=DEFAULT_VARIANT):
+        """Returns {station_id: {terminus_id: [minutes, ...]}} for a variant, loading it if needed."""
+        variant = self.resolve_variant(variant)
+        if variant not in self._indexes:
+            by_name = timetable.build_index(timetable.load_timetable(self.files[variant]))
+            station_id = self.network.station_id
+            self._indexes[variant] = {
+                station_id(station, self.id): {station_id(terminus, self.id): minutes
+                                               for terminus, minutes in directions.items()}
+                for station, directions in by_name.items()
+            }
+            logging.info(f"Loaded MRT Line {self.id} {variant} timetable ({len(by_name)} stations)")
+        return self._indexes[variant]
+
+    @property
+    def loaded(self):
+        return bool(self._indexes)
+
+class Network:
+    """Lines discovered on disk plus the persistent station ID registry."""
+
+    def __init__(self, directory='.', registry_file=STATION_REGISTRY_FILE):
+        self.lines = {line: Line(self, line, files)
+                      for line, files in sorted(discover_lines(directory).items(), key=lambda x: line_sort_key(x[0]))}
+        self.registry_file = registry_file
+        self.stations = {}  # id -> {'id', 'name', 'lines'}
+        self.ids = {}       # name -> id
+        self.aliases = {}   # alternative spelling -> registered name
+        self.dirty = False
+        self.load_registry()
+
+    def load_registry(self):
+        if not os.path.exists(self.registry_file):
+            return
+        with open(self.registry_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for station in data.get('stations', []):
+            self.stations[station['id']] = station
+            self.ids[station['name']] = station['id']
+        self.aliases = data.get('aliases', {})
+
+    def save_registry(self):
+        """Writes the registry if IDs were added since it was loaded. Returns True if written."""
+        if not self.dirty:
+            return False
+        with open(self.registry_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'stations': [self.stations[station_id] for station_id in sorted(self.stations)],
+                'aliases': self.aliases
+            }, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        self.dirty = False
+        return True
+
+    def station_id(self, name, line=None):
+        """Returns the stable ID of a station, registering it (and the line serving it) if new.
+        IDs are never reused, so a station keeps its ID as lines are added."""
+        name = self.aliases.get(name, name)
+        station_id = self.ids.get(name)
+        if station_id is None:
+            station_id = max(self.stations, default=0) + 1
+            self.stations[station_id] = {'id': station_id, 'name': name, 'lines': []}
+            self.ids[name] = station_id
+            self.dirty = True
+        station = self.stations[station_id]
+        if line is not None and line not in station['lines']:
+            station['lines'] = sorted(station['lines'] + [line], key=line_sort_key)
+            self.dirty = True
+        return station_id
+
+    def find_station(self, value):
+        """Looks a station up by ID or name (or alias). Returns its ID, or None."""
+        if value is None:
+            return None
+        if value.isdigit():
+            return int(value) if int(value) in self.stations else None
+        return self.ids.get(self.aliases.get(value, value))
+
+    def station_name(self, station_id):
+        return self.stations[station_id]['name']
+
+    def interchanges(self):
+        """Station IDs served by more than one line, from the registry (no timetables are loaded)."""
+        return [station_id for station_id, station in sorted(self.stations.items()) if len(station['lines']) > 1]
+
+    def sync(self):
+        """Loads every line and variant so all stations get registered, then saves the registry."""
+        for line in self.lines.values():
+            for variant in line.variants:
+                line.index(variant)
+        return self.save_registry()
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect the metro network and maintain station IDs')
+    parser.add_argument('--registry', default=STATION_REGISTRY_FILE, help='Station ID registry file')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('sync', help='Register stations of every line timetable and save their IDs')
+    subparsers.add_parser('list', help='Show lines, variants and interchange stations')
+    args = parser.parse_args()
+
+    network = Network(registry_file=args.registry)
+    if args.command == 'sync':
+        changed = network.sync()
+        print(f"{'💾 Updated' if changed else '✅ Up to date:'} {args.registry} "
+              f"({len(network.stations)} stations, {len(network.lines)} lines)")
+        return 0
+
+    for line in network.lines.values():
+        print(f"🚇 MRT Line {line.id}: {', '.join(f'{v} ({os.path.basename(f)})' for v, f in line.files.items())}")
+    interchanges = network.interchanges()
+    if interchanges:
+        print(f"🔀 Interchanges: {', '.join(network.station_name(i) for i in interchanges)}")
+    print(f"📍 {len(network.stations)} registered stations")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
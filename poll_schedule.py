@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Adaptive per-source polling schedule for the Metro RSS generator
+Learns how often each source changes from its change history, polls busy
+sources more often and backs off quiet or failing ones exponentially.
+Schedules live in the change-detection cache under 'sources'
+"""
+
+import statistics
+from datetime import datetime, timedelta, timezone
+
+MIN_POLL_INTERVAL = 15 * 60            # Never poll a source more often than this (seconds)
+MAX_POLL_INTERVAL = 24 * 60 * 60       # Every source is polled at least daily
+DEFAULT_POLL_INTERVAL = 6 * 60 * 60    # Until a source has change history
+POLL_FRACTION = 0.25                   # Poll four times per typical gap between changes
+QUIET_BACKOFF = 1.5                    # Growth per unchanged poll
+FAILURE_BACKOFF = 2                    # Growth per consecutive failed poll
+MAX_CHANGE_GAPS = 10                   # Change gaps remembered per source
+
+def source_schedule(cache, name):
+    """Returns the schedule dict for a source, creating it (due now) if missing."""
+    return cache.setdefault('sources', {}).setdefault(name, {
+        'interval': DEFAULT_POLL_INTERVAL,
+        'next_check': None,
+        'content_hash': None,                 # Fingerprint of the notices on the page
+        'last_change': None,
+        'unchanged_polls': 0,                 # Polls without a change since the last change
+        'change_gaps': [],
+        'failures': 0
+    })
+
+def is_due(schedule, now=None):
+    """True if the source's next poll time has passed."""
+    if not schedule.get('next_check'):
+        return True
+    now = now or datetime.now(timezone.utc)
+    return datetime.fromisoformat(schedule['next_check']) <= now
+
+def clamp_interval(seconds):
+    return max(MIN_POLL_INTERVAL, min(MAX_POLL_INTERVAL, seconds))
+
+def learned_interval(schedule):
+    """Poll interval implied by the source's recent gaps between changes."""
+    if not schedule['change_gaps']:
+        return DEFAULT_POLL_INTERVAL
+    return clamp_interval(statistics.median(schedule['change_gaps']) * POLL_FRACTION)
+
+def _schedule_next(schedule, interval, now):
+    schedule['interval'] = interval
+    schedule['next_check'] = (now + timedelta(seconds=interval)).isoformat()
+
+def record_poll(schedule, content_hash, now=None):
+    """Updates a source's schedule after a successful poll. Returns True if its content changed."""
+    now = now or datetime.now(timezone.utc)
+    schedule['failures'] = 0
+    changed = content_hash != schedule['content_hash']
+
+    if changed:
+        interval = schedule['interval']
+        # The first hash only sets a baseline; it isn't evidence of how often the source changes.
+        # A change on every poll only shows the source changes at least as often as it is polled,
+        # so the gap isn't learned; the interval shrinks until a poll finds nothing new
+        if schedule['content_hash'] and schedule['last_change'] and schedule.get('unchanged_polls', 0):
+            gap = (now - datetime.fromisoformat(schedule['last_change'])).total_seconds()
+            schedule['change_gaps'] = (schedule['change_gaps'] + [gap])[-MAX_CHANGE_GAPS:]
+            interval = learned_interval(schedule)
+        elif schedule['content_hash']:
+            interval = clamp_interval(interval / QUIET_BACKOFF)
+        else:
+            interval = learned_interval(schedule)
+        schedule['content_hash'] = content_hash
+        schedule['last_change'] = now.isoformat()
+        schedule['unchanged_polls'] = 0
+    else:
+        schedule['unchanged_polls'] = schedule.get('unchanged_polls', 0) + 1
+        interval = clamp_interval(schedule['interval'] * QUIET_BACKOFF)
+
+    _schedule_next(schedule, interval, now)
+    return changed
+
+def record_failure(schedule, now=None):
+    """Backs a source off exponentially after a failed poll.
+    Only the next poll is delayed; the learned interval resumes after the next successful poll."""
+    now = now or datetime.now(timezone.utc)
+    schedule['failures'] += 1
+    delay = clamp_interval(schedule['interval'] * FAILURE_BACKOFF ** schedule['failures'])
+    schedule['next_check'] = (now + timedelta(seconds=delay)).isoformat()
+
+def seconds_until_next_poll(cache, now=None):
+    """Seconds until the earliest scheduled poll of any source (0 if one is due), or None."""
+    now = now or datetime.now(timezone.utc)
+    next_checks = [datetime.fromisoformat(s['next_check'])
+                   for s in cache.get('sources', {}).values() if s.get('next_check')]
+    if not next_checks:
+        return None
+    return max(0.0, (min(next_checks) - now).total_seconds())
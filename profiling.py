@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Opt-in profiling for the Metro RSS scripts
+Wraps an entry point in cProfile, tracemalloc or a low-overhead stack sampler
+and writes the raw profile plus a top-N hotspot summary
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+PROFILE_MODES = ('cpu', 'memory', 'sample')
+PROFILE_DIR = "profiles"
+DEFAULT_TOP_N = 25
+DEFAULT_SAMPLE_INTERVAL = 0.01  # 10ms keeps overhead low enough for scheduled runs
+
+def add_profile_arguments(parser):
+    """Adds the shared --profile options to an argparse parser."""
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help='Profile the run: cpu (cProfile), memory (tracemalloc) or sample (stack sampling)')
+    parser.add_argument('--profile-output', help='Output path prefix (default: profiles/<script>-<timestamp>)')
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_TOP_N, help='Hotspots to include in the summary')
+    parser.add_argument('--profile-interval', type=float, default=DEFAULT_SAMPLE_INTERVAL,
+                        help='Seconds between stack samples in sample mode')
+
+def default_output_prefix(name):
+    """Returns profiles/<name>-<timestamp>, creating the profiles directory."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return os.path.join(PROFILE_DIR, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+
+def run_profiled(func, args, name):
+    """Runs `func()` under the profiler selected by `args.profile` and returns its result."""
+    if not getattr(args, 'profile', None):
+        return func()
+
+    prefix = args.profile_output or default_output_prefix(name)
+    runner = {
+        'cpu': _run_cprofile,
+        'memory': _run_tracemalloc,
+        'sample': _run_sampler
+    }[args.profile]
+    return runner(func, prefix, args)
+
+def _write_summary(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+    print(text, file=sys.stderr)
+    print(f"📝 Profile summary saved to {path}", file=sys.stderr)
+
+def _run_cprofile(func, prefix, args):
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{prefix}.prof")
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(args.profile_top)
+        _write_summary(f"{prefix}.txt", stream.getvalue())
+        print(f"💾 cProfile data saved to {prefix}.prof", file=sys.stderr)
+
+def _run_tracemalloc(func, prefix, args):
+    import tracemalloc
+
+    tracemalloc.start(25)
+    try:
+        return func()
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot.dump(f"{prefix}.snapshot")
+
+        lines = [f"Current: {current / 1024:.1f} KiB, peak: {peak / 1024:.1f} KiB",
+                 f"Top {args.profile_top} allocation sites:"]
+        for stat in snapshot.statistics('lineno')[:args.profile_top]:
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}")
+        _write_summary(f"{prefix}.txt", '\n'.join(lines) + '\n')
+        print(f"💾 tracemalloc snapshot saved to {prefix}.snapshot", file=sys.stderr)
+
+class StackSampler:
+    """Samples the stack of one thread at a fixed interval from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples += 1
+            self.self_counts[stack[0]] += 1
+            for entry in set(stack):
+                self.total_counts[entry] += 1
+            self.stacks[';'.join(reversed(stack))] += 1
+
+def _run_sampler(func, prefix, args):
+    sampler = StackSampler(threading.get_ident(), args.profile_interval)
+    started = time.perf_counter()
+    sampler.start()
+    try:
+        return func()
+    finally:
+        sampler.stop()
+        elapsed = time.perf_counter() - started
+
+        with open(f"{prefix}.folded", 'w') as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        total = max(sampler.samples, 1)
+        lines = [f"{sampler.samples} samples over {elapsed:.2f}s (interval {args.profile_interval * 1000:.0f}ms)",
+                 f"Top {args.profile_top} by self samples:"]
+        for entry, count in sampler.self_counts.most_common(args.profile_top):
+            lines.append(f"  {count / total:6.1%}  {entry}")
+        lines.append(f"Top {args.profile_top} by total samples:")
+        for entry, count in sampler.total_counts.most_common(args.profile_top):
+            lines.append(f"  {count / total:6.1%}  {entry}")
+        _write_summary(f"{prefix}.txt", '\n'.join(lines) + '\n')
+        print(f"💾 Folded stacks saved to {prefix}.folded", file=sys.stderr)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Load generator for the Metro query server
+Replays a mix of timetable and feed queries over keep-alive connections
+and reports p50/p99 latency and requests per second. With --spawn it starts
+the server itself, pinned to a single CPU core
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote, urlencode, urlsplit
+
+from metrics import percentile
+from network import Network
+
+DEFAULT_URL = 'http://127.0.0.1:8080'
+DEFAULT_CONNECTIONS = 32
+DEFAULT_DURATION = 10.0
+DEFAULT_WARMUP = 1.0
+SERVER_START_TIMEOUT = 10.0
+
+def build_targets(metro_network=None):
+    """Builds the query mix: mostly current-time boards and next trains, some fixed-time and static queries."""
+    metro_network = metro_network or Network()
+    name = metro_network.station_name
+    targets = []
+    for line in metro_network.lines.values():
+        for station_id, directions in line.index().items():
+            station = {'station': name(station_id), 'line': line.id}
+            targets += [f"/board?{urlencode(station, quote_via=quote)}"] * 4
+            for terminus_id in directions:
+                query = {**station, 'direction': name(terminus_id)}
+                targets += [f"/next?{urlencode(query, quote_via=quote)}"] * 2
+                targets.append(f"/next?{urlencode({**query, 'time': '08:30'}, quote_via=quote)}")
+            for variant in line.variants:
+                targets.append(f"/first?{urlencode({**station, 'variant': variant}, quote_via=quote)}")
+                targets.append(f"/last?{urlencode({**station, 'variant': variant}, quote_via=quote)}")
+    targets += ['/stations', '/feed', '/feed?limit=5']
+    return targets
+
+async def read_response(reader):
+    """Reads one HTTP/1.1 response. Returns its status code."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    length = 0
+    for line in lines[1:]:
+        if line[:15].lower() == 'content-length:':
+            length = int(line[15:])
+    if length:
+        await reader.readexactly(length)
+    return status
+
+async def worker(host, port, targets, deadline, warmup_until, latencies, statuses):
+    """Sends requests back to back on one connection until `deadline`."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            target = random.choice(targets)
+            start = time.perf_counter()
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+            status = await read_response(reader)
+            end = time.perf_counter()
+            if start >= warmup_until:
+                latencies.append(end - start)
+                statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+async def run_load(url, connections, duration, warmup):
+    """Runs the load test. Returns a result dict."""
+    parts = urlsplit(url)
+    targets = build_targets()
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    warmup_until = start + warmup
+    deadline = warmup_until + duration
+    await asyncio.gather(*(worker(parts.hostname, parts.port or 80, targets, deadline, warmup_until,
+                                  latencies, statuses) for _ in range(connections)))
+    elapsed = time.perf_counter() - warmup_until
+    return {
+        'url': url,
+        'connections': connections,
+        'duration_s': round(elapsed, 3),
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        'max_ms': round(max(latencies) * 1000, 3) if latencies else None,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'measured_at': datetime.now(timezone.utc).isoformat()
+    }
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def spawn_server(port, cpu, prewarm=False):
+    """Starts query_server.py pinned to `cpu` (where the platform allows). Returns the process."""
+    pin = (lambda: os.sched_setaffinity(0, {cpu})) if hasattr(os, 'sched_setaffinity') else None
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_server.py'),
+               '--port', str(port)]
+    if prewarm:
+        command.append('--prewarm')
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, preexec_fn=pin)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Query server did not start on port {port}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Metro query server')
+    parser.add_argument('--url', default=DEFAULT_URL, help='Base URL of a running query server')
+    parser.add_argument('--spawn', action='store_true', help='Start the server on a free port pinned to one CPU')
+    parser.add_argument('--prewarm', action='store_true', help='Start a spawned server with --prewarm')
+    parser.add_argument('--cpu', type=int, default=0, help='CPU core to pin a spawned server to')
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS, help='Concurrent keep-alive connections')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help='Seconds to measure')
+    parser.add_argument('--warmup', type=float, default=DEFAULT_WARMUP, help='Seconds of unmeasured warm-up')
+    parser.add_argument('--output', help='Also write the results as JSON to this file')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if args.spawn:
+        port = free_port()
+        server = spawn_server(port, args.cpu, args.prewarm)
+        url = f"http://127.0.0.1:{port}"
+        # Keep the load generator off the server's core so it measures the server, not the contention
+        if hasattr(os, 'sched_setaffinity') and len(os.sched_getaffinity(0)) > 1:
+            os.sched_setaffinity(0, os.sched_getaffinity(0) - {args.cpu})
+
+    try:
+        result = asyncio.run(run_load(url, args.connections, args.duration, args.warmup))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    result['server_cpu'] = args.cpu if args.spawn else None
+
+    print(f"⚡ {result['requests']} requests in {result['duration_s']}s over {result['connections']} connections")
+    print(f"   {result['requests_per_second']} req/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+          f"max {result['max_ms']} ms")
+    print(f"   Statuses: {result['statuses']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+    return 0 if set(result['statuses']) <= {'200', '304'} else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
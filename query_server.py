@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+HTTP query service for Metro Timings
+An asyncio server answering next-departure, first/last train and station
+board queries for every line of the network, plus the current feed items.
+Responses are cached as ready-to-send bytes with ETag/Cache-Control headers
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import formatdate
+from urllib.parse import parse_qs, quote, urlencode, urlsplit
+
+import timetable
+from network import Network
+from generate_metro_rss import LOCAL_TIMEZONE, RSS_FILENAME, load_feed_items
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_COUNT = 5
+MAX_COUNT = 50
+DEFAULT_FEED_LIMIT = 20
+RESPONSE_CACHE_SIZE = 4096      # Distinct request targets kept as encoded responses
+STATIC_MAX_AGE = 3600           # Seconds clients may cache answers that don't depend on the clock
+FEED_MAX_AGE = 300
+FEED_RELOAD_SECONDS = 5         # How often the feed file's mtime is checked
+MAX_REQUEST_HEAD = 8192
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+class QueryError(Exception):
+    """A request the service can't answer; carries the HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def service_variant(day):
+    """Timetable variant running on a date (Friday and Saturday have their own)."""
+    return {4: 'friday', 5: 'saturday'}.get(day.weekday(), 'weekday')
+
+class CachedResponse:
+    """An encoded response body with its validator and caching policy."""
+    __slots__ = ('status', 'body', 'etag', 'content_type', 'max_age', 'minute')
+
+    def __init__(self, status, body, content_type='application/json; charset=utf-8', max_age=STATIC_MAX_AGE, minute=None):
+        self.status = status
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        self.content_type = content_type
+        self.max_age = max_age
+        # Epoch minute of answers computed from the current time; they expire when it changes
+        self.minute = minute
+
+class QueryService:
+    """The metro network (lines load on first query), feed items and the encoded response cache."""
+
+    def __init__(self, metro_network=None, feed_file=RSS_FILENAME):
+        self.network = metro_network or Network()
+        self.feed_file = feed_file
+        self.feed_mtime = None
+        self.feed_items = []
+        self.feed_bytes = b''
+        self.next_feed_check = 0.0
+        self.cache = OrderedDict()
+        self.reload_feed()
+
+    def reload_feed(self):
+        """Reloads feed items if the feed file changed. Returns True if it did."""
+        self.next_feed_check = time.monotonic() + FEED_RELOAD_SECONDS
+        try:
+            mtime = os.stat(self.feed_file).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self.feed_mtime:
+            return False
+        self.feed_mtime = mtime
+        self.feed_items, self.feed_bytes = [], b''
+        if mtime:
+            with open(self.feed_file, 'rb') as f:
+                self.feed_bytes = f.read()
+            self.feed_items = load_feed_items(self.feed_file)
+        # Feed answers are cached alongside timetable ones, so drop everything
+        self.cache.clear()
+        logging.info(f"Loaded {len(self.feed_items)} feed items from {self.feed_file}")
+        return True
+
+    def prewarm(self, lines=False):
+        """Encodes the answers that need no timetable up front. Line answers are cached on first
+        use, unless `lines` is set: then every line is loaded and each station's first/last
+        train answers are encoded too, both with and without an explicit line."""
+        for target in ['/stations', '/feed', '/feed.xml']:
+            self.respond(target)
+        if lines:
+            name = self.network.station_name
+            for line in self.network.lines.values():
+                for variant in line.variants:
+                    for station_id in line.index(variant):
+                        for endpoint in ('first', 'last'):
+                            for query in ({'station': name(station_id), 'variant': variant},
+                                          {'station': name(station_id), 'line': line.id, 'variant': variant}):
+                                self.respond(f"/{endpoint}?{urlencode(query, quote_via=quote)}")
+        return len(self.cache)
+
+    def respond(self, target, now=None):
+        """Returns the CachedResponse for a request target, computing it on a cache miss."""
+        if time.monotonic() >= self.next_feed_check:
+            self.reload_feed()
+
+        now = now or datetime.now(LOCAL_TIMEZONE)
+        # The absolute minute, not the minute of day: the same clock time on another date
+        # can run a different service variant
+        minute = int(now.timestamp()) // 60
+        response = self.cache.get(target)
+        if response is not None and (response.minute is None or response.minute == minute):
+            self.cache.move_to_end(target)
+            return response
+
+        try:
+            response = self.compute(target, now, minute)
+        except QueryError as e:
+            response = CachedResponse(e.status, json.dumps({'error': str(e)}).encode('utf-8') + b'\n', max_age=0)
+        self.cache[target] = response
+        if len(self.cache) > RESPONSE_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return response
+
+    def compute(self, target, now, minute):
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        path = url.path.rstrip('/') or '/'
+
+        if path == '/stations':
+            return self.json_response({
+                'stations': [self.network.stations[station_id] for station_id in sorted(self.network.stations)],
+                'lines': {line.id: line.variants for line in self.network.lines.values()}
+            })
+        if path == '/feed':
+            return self.feed_response(params)
+        if path == '/feed.xml':
+            if not self.feed_mtime:
+                raise QueryError(404, 'Feed not generated yet')
+            return CachedResponse(200, self.feed_bytes, 'application/rss+xml; charset=utf-8', FEED_MAX_AGE)
+
+        if path not in ('/first', '/last', '/next', '/board'):
+            raise QueryError(404, f"Unknown endpoint: {path}")
+        station_id = self.network.find_station(params.get('station'))
+        if station_id is None:
+            raise QueryError(404, f"Unknown station: {params.get('station')}")
+        line = self.select_line(params.get('line'), station_id)
+        if 'variant' in params and params['variant'] not in line.files:
+            raise QueryError(400, f"Unknown variant for MRT Line {line.id}: {params['variant']}")
+        # Without an explicit variant (or time) the answer depends on the clock and expires with the minute
+        clock_minute = None if 'variant' in params else minute
+        variant = line.resolve_variant(params.get('variant') or service_variant(now))
+        directions = line.index(variant).get(station_id)
+        if directions is None:
+            raise QueryError(404, f"MRT Line {line.id} does not serve {self.network.station_name(station_id)}")
+        name = self.network.station_name
+        station = {'station': name(station_id), 'station_id': station_id, 'line': line.id, 'variant': variant}
+
+        if path in ('/first', '/last'):
+            pick = timetable.first_train if path == '/first' else timetable.last_train
+            return self.json_response({
+                **station,
+                path[1:]: {name(terminus): self.format_time(pick(minutes)) for terminus, minutes in directions.items()}
+            }, now, clock_minute)
+
+        if 'time' in params:
+            try:
+                hours, minutes = (int(part) for part in params['time'].split(':'))
+            except ValueError:
+                raise QueryError(400, f"Invalid time: {params['time']}")
+            if not (0 <= hours <= 23 and 0 <= minutes <= 59):
+                raise QueryError(400, f"Invalid time: {params['time']}")
+            current = hours * 60 + minutes
+        else:
+            current, clock_minute = now.hour * 60 + now.minute, minute
+        try:
+            count = min(MAX_COUNT, max(1, int(params.get('count', DEFAULT_COUNT))))
+        except ValueError:
+            raise QueryError(400, f"Invalid count: {params['count']}")
+
+        if path == '/next':
+            terminus_id = self.network.find_station(params.get('direction'))
+            if terminus_id not in directions:
+                raise QueryError(404, f"Unknown direction from {station['station']}: {params.get('direction')}")
+            selected = {terminus_id: directions[terminus_id]}
+        else:
+            selected = directions
+
+        board = {}
+        for terminus_id, minutes in selected.items():
+            board[name(terminus_id)] = [{
+                'time': timetable.minutes_to_time(m),
+                'next_day': next_day,
+                'in_minutes': m + (24 * 60 if next_day else 0) - current
+            } for m, next_day in timetable.get_next_trains(minutes, current, count)]
+        body = {**station, 'time': timetable.minutes_to_time(current), 'departures': board}
+        return self.json_response(body, now, clock_minute)
+
+    def select_line(self, line_id, station_id):
+        """The requested line, or the first line serving the station."""
+        if line_id is not None:
+            if line_id not in self.network.lines:
+                raise QueryError(404, f"Unknown line: {line_id}")
+            return self.network.lines[line_id]
+        for line_id in self.network.stations[station_id]['lines']:
+            if line_id in self.network.lines:
+                return self.network.lines[line_id]
+        return next(iter(self.network.lines.values()))
+
+    def feed_response(self, params):
+        try:
+            limit = max(1, int(params.get('limit', DEFAULT_FEED_LIMIT)))
+        except ValueError:
+            raise QueryError(400, f"Invalid limit: {params['limit']}")
+        source = params.get('source')
+        items = []
+        for item in self.feed_items:
+            if source and item.source != source:
+                continue
+            items.append({
+                'title': item.feed_title,
+                'link': item.link,
+                'guid': item.guid,
+                'source': item.source,
+                'pub_date': item.pub_date.isoformat(),
+                'description': item.description
+            })
+            if len(items) >= limit:
+                break
+        return self.json_response({'items': items}, max_age=FEED_MAX_AGE)
+
+    @staticmethod
+    def format_time(minutes):
+        return timetable.minutes_to_time(minutes) if minutes is not None else None
+
+    @staticmethod
+    def json_response(body, now=None, clock_minute=None, max_age=STATIC_MAX_AGE):
+        """Encodes a JSON answer; answers tied to `clock_minute` may only be cached until it ends."""
+        encoded = json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if clock_minute is not None:
+            max_age = 60 - now.second
+        return CachedResponse(200, encoded, max_age=max_age, minute=clock_minute)
+
+def encode_response(response, not_modified, head, keep_alive):
+    """Serialises a CachedResponse (or a 304 for it) to HTTP/1.1 bytes."""
+    status = 304 if not_modified else response.status
+    body = b'' if not_modified or head else response.body
+    cache_control = f"public, max-age={response.max_age}" if response.max_age > 0 else 'no-store'
+    head_lines = (
+        f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+        f"Date: {formatdate(usegmt=True)}\r\n"
+        f"Content-Type: {response.content_type}\r\n"
+        f"Content-Length: {0 if not_modified else len(response.body)}\r\n"
+        f"ETag: {response.etag}\r\n"
+        f"Cache-Control: {cache_control}\r\n"
+        f"Access-Control-Allow-Origin: *\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head_lines.encode('latin-1') + body
+
+def parse_request_head(data):
+    """Splits a request head into (method, target, version, {lowercased header: value})."""
+    lines = data.decode('latin-1').split('\r\n')
+    method, target, version = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+async def handle_connection(service, reader, writer):
+    """Serves requests on one keep-alive connection until the client closes it."""
+    try:
+        while True:
+            try:
+                data = await reader.readuntil(b'\r\n\r\n')
+            except asyncio.LimitOverrunError:
+                break
+            except asyncio.IncompleteReadError:
+                break
+            try:
+                method, target, version, headers = parse_request_head(data)
+            except ValueError:
+                writer.write(encode_response(CachedResponse(400, b'{"error":"Malformed request"}\n', max_age=0),
+                                             False, False, False))
+                break
+
+            keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+            if method not in ('GET', 'HEAD'):
+                response = CachedResponse(405, b'{"error":"Only GET and HEAD are supported"}\n', max_age=0)
+                not_modified = False
+            else:
+                response = service.respond(target)
+                if_none_match = headers.get('if-none-match')
+                not_modified = (response.status == 200 and if_none_match is not None
+                                and response.etag in [tag.strip() for tag in if_none_match.split(',')])
+            writer.write(encode_response(response, not_modified, method == 'HEAD', keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(service, host, port):
+    """Runs the query server until cancelled."""
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port,
+                                        limit=MAX_REQUEST_HEAD)
+    address = server.sockets[0].getsockname()
+    print(f"🚇 Metro query server on http://{address[0]}:{address[1]} "
+          f"({len(service.network.lines)} lines, {len(service.network.stations)} stations, "
+          f"{len(service.feed_items)} feed items)")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve timetable and feed queries over HTTP')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='Address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on (0 picks a free port)')
+    parser.add_argument('--feed', default=RSS_FILENAME, help='RSS feed file to serve items from')
+    parser.add_argument('--prewarm', action='store_true',
+                        help='Load every line at startup and pre-encode first/last train answers')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    service = QueryService(feed_file=args.feed)
+    logging.info(f"Pre-encoded {service.prewarm(args.prewarm)} responses")
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
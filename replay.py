@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Record/replay harness for the Metro RSS scripts
+Records live responses into a fixture store and replays them from a local
+HTTP server with configurable latency, errors and 304 responses
+
+Point the scripts at a running replay server with:
+    METRO_REPLAY_URL=http://127.0.0.1:8765 python generate_metro_rss.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = "fixtures"
+STORE_INDEX = "index.json"
+REPLAY_URL_ENV = "METRO_REPLAY_URL"
+DEFAULT_PORT = 8765
+
+# Headers that describe the original transfer rather than the content
+SKIPPED_HEADERS = {'connection', 'content-encoding', 'content-length', 'keep-alive', 'transfer-encoding'}
+
+def resolve_url(url):
+    """Rewrites `url` to the replay server when METRO_REPLAY_URL is set.
+
+    https://dmtcl.gov.bd/site/notices becomes <replay>/dmtcl.gov.bd/site/notices,
+    so links extracted from the page are still resolved against the original URL.
+    """
+    base = os.environ.get(REPLAY_URL_ENV)
+    if not base:
+        return url
+    parts = urlsplit(url)
+    path = f"/{parts.netloc}{parts.path or '/'}"
+    if parts.query:
+        path += f"?{parts.query}"
+    return base.rstrip('/') + path
+
+def load_store(fixtures_dir=FIXTURES_DIR):
+    """Loads the fixture index as {url: entry}."""
+    index_path = os.path.join(fixtures_dir, STORE_INDEX)
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, 'r') as f:
+        return json.load(f)
+
+def load_body(fixtures_dir, entry):
+    """Reads the recorded body for an index entry."""
+    with open(os.path.join(fixtures_dir, entry['body']), 'rb') as f:
+        return f.read()
+
+def save_fixture(fixtures_dir, url, status, headers, body):
+    """Adds or replaces a recorded response in the fixture store."""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    store = load_store(fixtures_dir)
+    body_name = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + '.body'
+    with open(os.path.join(fixtures_dir, body_name), 'wb') as f:
+        f.write(body)
+    store[url] = {
+        'status': status,
+        'headers': {k: v for k, v in headers.items() if k.lower() not in SKIPPED_HEADERS},
+        'body': body_name,
+        'recorded_at': datetime.now(timezone.utc).isoformat()
+    }
+    with open(os.path.join(fixtures_dir, STORE_INDEX), 'w') as f:
+        json.dump(store, f, indent=2, sort_keys=True)
+
+def default_record_urls():
+    """Returns every URL the generator, health check and validator fetch."""
+    from generate_metro_rss import METRO_SOURCES
+    from health_check import RSS_URL
+    return [source['url'] for source in METRO_SOURCES] + [RSS_URL]
+
+def record(urls, fixtures_dir):
+    """Fetches each URL live and stores the response. Returns the number recorded."""
+    import requests
+
+    recorded = 0
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+    for url in urls:
+        try:
+            response = requests.get(url, headers=headers, timeout=30)
+            save_fixture(fixtures_dir, url, response.status_code, dict(response.headers), response.content)
+            print(f"✅ Recorded {url} ({response.status_code}, {len(response.content)} bytes)")
+            recorded += 1
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Could not record {url}: {e}")
+    return recorded
+
+def make_handler(fixtures_dir, latency, jitter, error_rate, error_status, conditional):
+    """Builds a request handler class replaying the fixture store."""
+    from email.utils import parsedate_to_datetime
+    from http.server import BaseHTTPRequestHandler
+
+    store = load_store(fixtures_dir)
+    bodies = {url: load_body(fixtures_dir, entry) for url, entry in store.items()}
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _lookup(self):
+            for scheme in ('https', 'http'):
+                url = f"{scheme}:/{self.path}"
+                if url in store:
+                    return url
+            return None
+
+        def _not_modified(self, entry, etag):
+            if not conditional:
+                return False
+            if_none_match = self.headers.get('If-None-Match')
+            if if_none_match:
+                return etag in [tag.strip() for tag in if_none_match.split(',')]
+            if_modified_since = self.headers.get('If-Modified-Since')
+            last_modified = entry['headers'].get('Last-Modified')
+            if if_modified_since and last_modified:
+                try:
+                    return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def _send(self, status, headers, body):
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+
+        def do_GET(self):
+            delay = latency + random.uniform(0, jitter)
+            if delay > 0:
+                time.sleep(delay)
+
+            url = self._lookup()
+            if url is None:
+                self._send(404, {'Content-Type': 'text/plain'}, b'Not recorded\n')
+                return
+            if random.random() < error_rate:
+                self._send(error_status, {'Content-Type': 'text/plain'}, b'Injected error\n')
+                return
+
+            entry = store[url]
+            body = bodies[url]
+            headers = dict(entry['headers'])
+            etag = headers.get('ETag') or f'"{hashlib.sha1(body).hexdigest()}"'
+            headers['ETag'] = etag
+            if self._not_modified(entry, etag):
+                self._send(304, {'ETag': etag}, b'')
+                return
+            self._send(entry['status'], headers, body)
+
+        do_HEAD = do_GET
+
+        def log_message(self, format, *args):
+            print(f"↔️  {self.address_string()} {format % args}")
+
+    return ReplayHandler
+
+def serve(fixtures_dir, port, latency, jitter, error_rate, error_status, conditional):
+    """Serves the fixture store until interrupted."""
+    from http.server import ThreadingHTTPServer
+
+    handler = make_handler(fixtures_dir, latency, jitter, error_rate, error_status, conditional)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    print(f"🔁 Replaying {len(load_store(fixtures_dir))} recorded responses on http://127.0.0.1:{server.server_port}")
+    print(f"   export {REPLAY_URL_ENV}=http://127.0.0.1:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and replay Metro RSS source responses')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Fixture store directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='Record live responses into the fixture store')
+    record_parser.add_argument('urls', nargs='*', help='URLs to record (default: every source and feed URL)')
+
+    serve_parser = subparsers.add_parser('serve', help='Replay recorded responses over HTTP')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on (0 picks a free port)')
+    serve_parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    serve_parser.add_argument('--jitter', type=float, default=0.0, help='Extra random latency of up to this many seconds')
+    serve_parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with an error')
+    serve_parser.add_argument('--error-status', type=int, default=503, help='Status code for injected errors')
+    serve_parser.add_argument('--no-conditional', action='store_true',
+                              help='Ignore If-None-Match/If-Modified-Since instead of answering 304')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        urls = args.urls or default_record_urls()
+        return 0 if record(urls, args.fixtures) == len(urls) else 1
+
+    serve(args.fixtures, args.port, args.latency, args.jitter, args.error_rate,
+          args.error_status, not args.no_conditional)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Full-text search over the Metro notice history
+Keeps an SQLite FTS5 index of every notice the generator has seen and
+answers ranked queries with source and date filters
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from feed_item import FeedItem
+
+SEARCH_DB_FILE = "metro_search.db"
+DEFAULT_LIMIT = 20
+
+# Porter stems English words and leaves Bangla alone; listing the mark categories
+# keeps Bangla vowel signs inside words instead of splitting on them
+FTS_TOKENIZER = "porter unicode61 remove_diacritics 0 categories 'L* N* Co Mc Mn'"
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS notices (
+    id INTEGER PRIMARY KEY,
+    guid TEXT NOT NULL UNIQUE,
+    source TEXT,
+    title TEXT NOT NULL,
+    description TEXT,
+    link TEXT,
+    pub_date INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notices_source_date ON notices (source, pub_date);
+CREATE INDEX IF NOT EXISTS notices_date ON notices (pub_date);
+CREATE VIRTUAL TABLE IF NOT EXISTS notices_fts USING fts5(
+    title, description, content='notices', content_rowid='id', tokenize="{FTS_TOKENIZER}"
+);
+"""
+
+def open_index(path=SEARCH_DB_FILE):
+    """Opens (creating if needed) the search index database."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+def index_updates(conn, updates):
+    """Adds FeedItems whose GUIDs are not indexed yet. Returns the number added."""
+    added = 0
+    with conn:
+        for update in updates:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO notices (guid, source, title, description, link, pub_date) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (update.guid, update.source, update.feed_title, update.description, update.link, update.published)
+            )
+            if cursor.rowcount:
+                conn.execute("INSERT INTO notices_fts (rowid, title, description) VALUES (?, ?, ?)",
+                             (cursor.lastrowid, update.feed_title, update.description))
+                added += 1
+    return added
+
+def read_feed_items(filename):
+    """Reads FeedItems from an RSS feed or archive page for backfilling the index."""
+    import xml.etree.ElementTree as ET
+
+    items = []
+    for item in ET.parse(filename).getroot().findall('./channel/item'):
+        guid = item.findtext('guid')
+        pub_date = item.findtext('pubDate')
+        if not guid or not pub_date:
+            continue
+        try:
+            parsed_date = parsedate_to_datetime(pub_date)
+        except (TypeError, ValueError):
+            continue
+        try:
+            items.append(FeedItem.from_feed_title(item.findtext('title') or '', item.findtext('link'), guid,
+                                                  parsed_date, item.findtext('description') or ''))
+        except ValueError:
+            continue
+    return items
+
+def build_match_query(query, match_any=False):
+    """Turns free text into an FTS5 query of quoted terms (all terms must match by default)."""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return (' OR ' if match_any else ' ').join(f'"{term}"' for term in terms)
+
+def search(conn, query, source=None, since=None, until=None, limit=DEFAULT_LIMIT, match_any=False):
+    """Returns ranked matches as dicts. `since`/`until` are timezone-aware datetimes."""
+    match = build_match_query(query, match_any)
+    if not match:
+        return []
+
+    sql = [
+        "SELECT n.guid, n.source, n.title, n.description, n.link, n.pub_date,",
+        f"       bm25(notices_fts, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) AS rank",
+        "FROM notices_fts JOIN notices n ON n.id = notices_fts.rowid",
+        "WHERE notices_fts MATCH ?"
+    ]
+    params = [match]
+    if source:
+        sql.append("AND n.source = ?")
+        params.append(source)
+    if since:
+        sql.append("AND n.pub_date >= ?")
+        params.append(int(since.timestamp()))
+    if until:
+        sql.append("AND n.pub_date < ?")
+        params.append(int(until.timestamp()))
+    sql.append("ORDER BY rank LIMIT ?")
+    params.append(limit)
+
+    results = []
+    for row in conn.execute('\n'.join(sql), params):
+        result = dict(row)
+        result['pub_date'] = datetime.fromtimestamp(row['pub_date'], timezone.utc).isoformat()
+        results.append(result)
+    return results
+
+def parse_date(value):
+    """Parses a YYYY-MM-DD command line date as midnight UTC."""
+    return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+def main():
+    parser = argparse.ArgumentParser(description='Search the Metro notice history')
+    parser.add_argument('--db', default=SEARCH_DB_FILE, help='Search index database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    search_parser = subparsers.add_parser('search', help='Run a ranked full-text query')
+    search_parser.add_argument('query', help='Words to search for (Bangla or English)')
+    search_parser.add_argument('--source', help='Only notices from this source')
+    search_parser.add_argument('--since', type=parse_date, help='Only notices on or after YYYY-MM-DD')
+    search_parser.add_argument('--until', type=parse_date, help='Only notices before YYYY-MM-DD')
+    search_parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='Maximum results')
+    search_parser.add_argument('--any', action='store_true', help='Match any word instead of all words')
+    search_parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    index_parser = subparsers.add_parser('index-feed', help='Backfill the index from RSS feed files')
+    index_parser.add_argument('files', nargs='+', help='Feed or archive page files')
+
+    subparsers.add_parser('stats', help='Show index size per source')
+
+    args = parser.parse_args()
+    if args.command != 'index-feed' and not os.path.exists(args.db):
+        print(f"❌ Search index not found: {args.db}")
+        return 1
+    conn = open_index(args.db)
+
+    if args.command == 'index-feed':
+        for filename in args.files:
+            try:
+                added = index_updates(conn, read_feed_items(filename))
+                print(f"✅ Indexed {added} new notices from {filename}")
+            except Exception as e:
+                print(f"❌ Could not index {filename}: {e}")
+        return 0
+
+    if args.command == 'stats':
+        for row in conn.execute("SELECT source, COUNT(*) AS notices, MIN(pub_date) AS first, MAX(pub_date) AS last "
+                                "FROM notices GROUP BY source ORDER BY notices DESC"):
+            first = datetime.fromtimestamp(row['first'], timezone.utc).date()
+            last = datetime.fromtimestamp(row['last'], timezone.utc).date()
+            print(f"📚 {row['source'] or 'Unknown'}: {row['notices']} notices ({first} to {last})")
+        return 0
+
+    results = search(conn, args.query, args.source, args.since, args.until, args.limit, args.any)
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return 0
+    if not results:
+        print("🔍 No matching notices")
+        return 0
+    for result in results:
+        print(f"📰 {result['pub_date'][:10]}  {result['title']}")
+        print(f"   {result['link']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
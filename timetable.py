@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Timetable helpers for Metro Timings
+Loads line timetable files and answers next/first/last train queries
+the same way script.js does in the browser (see network.py for the lines)
+"""
+
+import json
+from bisect import bisect_left
+
+def time_to_minutes(time_string):
+    """Converts an 'HH:MM' string to minutes after midnight."""
+    hours, minutes = time_string.split(':')
+    return int(hours) * 60 + int(minutes)
+
+def minutes_to_time(minutes):
+    """Converts minutes after midnight back to an 'HH:MM' string."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def load_timetable(filename):
+    """Loads a timetable file as {station: {direction: ['HH:MM', ...]}}."""
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def build_index(timetable):
+    """Builds {station: {direction: [minutes, ...]}} with sorted minute lists."""
+    index = {}
+    for station, directions in timetable.items():
+        index[station] = {
+            direction: sorted(time_to_minutes(t) for t in times)
+            for direction, times in directions.items()
+        }
+    return index
+
+def get_next_trains(minutes, current, count):
+    """Returns the next `count` departures at or after `current` (both in minutes).
+
+    Mirrors getNextTrains in script.js: when the day runs out, the earliest
+    trains are repeated as next-day departures. Each entry is a
+    (minutes, next_day) tuple.
+    """
+    start = bisect_left(minutes, current)
+    next_trains = [(m, False) for m in minutes[start:start + count]]
+    remaining = count - len(next_trains)
+    if remaining > 0:
+        next_trains.extend((m, True) for m in minutes[:remaining])
+    return next_trains
+
+def first_train(minutes):
+    """Returns the first departure of the day, or None."""
+    return minutes[0] if minutes else None
+
+def last_train(minutes):
+    """Returns the last departure of the day, or None."""
+    return minutes[-1] if minutes else None
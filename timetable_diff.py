@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Timetable revision diff for Metro Timings
+Compares two revisions of the timetable files as sorted minute arrays and
+publishes a summary of the changes as feed items
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import network
+import timetable
+from feed_item import FeedItem
+
+SHIFT_WINDOW_MINUTES = 15  # A removed and an added departure this close count as one shifted train
+MAX_PAIRS_IN_DESCRIPTION = 20
+VARIANT_NAMES = {
+    'weekday': 'Weekday',
+    'friday': 'Friday',
+    'saturday': 'Saturday'
+}
+
+def merge_diff(old, new):
+    """Linear merge of two sorted minute lists. Returns (added, removed) departures."""
+    added, removed = [], []
+    i = j = 0
+    while i < len(old) and j < len(new):
+        if old[i] == new[j]:
+            i += 1
+            j += 1
+        elif old[i] < new[j]:
+            removed.append(old[i])
+            i += 1
+        else:
+            added.append(new[j])
+            j += 1
+    removed.extend(old[i:])
+    added.extend(new[j:])
+    return added, removed
+
+def pair_shifts(added, removed, window=SHIFT_WINDOW_MINUTES):
+    """Pairs removed departures with nearby added ones in a second linear pass.
+    Returns (shifted [(old, new), ...], remaining added, remaining removed)."""
+    shifted, still_added, still_removed = [], [], []
+    i = j = 0
+    while i < len(removed) and j < len(added):
+        if abs(removed[i] - added[j]) <= window:
+            shifted.append((removed[i], added[j]))
+            i += 1
+            j += 1
+        elif removed[i] < added[j]:
+            still_removed.append(removed[i])
+            i += 1
+        else:
+            still_added.append(added[j])
+            j += 1
+    still_removed.extend(removed[i:])
+    still_added.extend(added[j:])
+    return shifted, still_added, still_removed
+
+def median_headway(minutes):
+    """Median minutes between consecutive departures, or None with fewer than two."""
+    if len(minutes) < 2:
+        return None
+    return statistics.median(b - a for a, b in zip(minutes, minutes[1:]))
+
+def diff_pair(old, new):
+    """Diffs the departures of one station/direction pair. Returns None when unchanged."""
+    if old == new:
+        return None
+    added, removed = merge_diff(old, new)
+    shifted, added, removed = pair_shifts(added, removed)
+    return {
+        'added': added,
+        'removed': removed,
+        'shifted': shifted,
+        'headway': (median_headway(old), median_headway(new)),
+        'first': (timetable.first_train(old), timetable.first_train(new)),
+        'last': (timetable.last_train(old), timetable.last_train(new))
+    }
+
+def diff_index(old_index, new_index):
+    """Diffs two timetable indexes. Returns {(station, direction): pair diff} for changed pairs."""
+    changes = {}
+    for station in sorted(set(old_index) | set(new_index)):
+        old_directions = old_index.get(station, {})
+        new_directions = new_index.get(station, {})
+        for direction in sorted(set(old_directions) | set(new_directions)):
+            change = diff_pair(old_directions.get(direction, []), new_directions.get(direction, []))
+            if change:
+                changes[(station, direction)] = change
+    return changes
+
+def load_revision(filename, rev=None):
+    """Loads a timetable file from the working tree or from a git revision."""
+    if rev is None:
+        return timetable.load_timetable(filename)
+    output = subprocess.run(['git', 'show', f'{rev}:{filename}'], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+def describe_pair(station, direction, change):
+    """One-line human summary of a pair's changes."""
+    fmt = timetable.minutes_to_time
+    parts = []
+    if change['added']:
+        parts.append(f"+{len(change['added'])} ({', '.join(fmt(m) for m in change['added'][:3])}"
+                     f"{', ...' if len(change['added']) > 3 else ''})")
+    if change['removed']:
+        parts.append(f"-{len(change['removed'])} ({', '.join(fmt(m) for m in change['removed'][:3])}"
+                     f"{', ...' if len(change['removed']) > 3 else ''})")
+    if change['shifted']:
+        parts.append(f"{len(change['shifted'])} shifted")
+    old_headway, new_headway = change['headway']
+    if old_headway != new_headway and old_headway is not None and new_headway is not None:
+        parts.append(f"headway {old_headway:g} → {new_headway:g} min")
+    for label in ('first', 'last'):
+        old, new = change[label]
+        if old != new and old is not None and new is not None:
+            parts.append(f"{label} train {fmt(old)} → {fmt(new)}")
+    return f"{station} → {direction}: {'; '.join(parts)}"
+
+def summarize_changes(line, variant, changes, content_hash):
+    """Builds a FeedItem summarising one line variant's timetable changes."""
+    added = sum(len(c['added']) for c in changes.values())
+    removed = sum(len(c['removed']) for c in changes.values())
+    shifted = sum(len(c['shifted']) for c in changes.values())
+    name = VARIANT_NAMES.get(variant, variant.title())
+
+    lines = [describe_pair(station, direction, change)
+             for (station, direction), change in list(changes.items())[:MAX_PAIRS_IN_DESCRIPTION]]
+    if len(changes) > MAX_PAIRS_IN_DESCRIPTION:
+        lines.append(f"...and {len(changes) - MAX_PAIRS_IN_DESCRIPTION} more station pairs")
+
+    from generate_metro_rss import FEED_LINK
+    return FeedItem(
+        f"MRT Line {line} {name} timetable updated: {added} added, {removed} removed, {shifted} shifted departures",
+        FEED_LINK,
+        hashlib.sha1(f"timetable-{variant}-{content_hash}".encode('utf-8')).hexdigest(),
+        datetime.now(timezone.utc),
+        '\n'.join(lines),
+        'Metro Timings'
+    )
+
+def diff_revisions(old_rev, new_rev=None):
+    """Diffs every line's timetable variants between two revisions. Returns FeedItems for changed variants."""
+    updates = []
+    for line, files in sorted(network.discover_lines().items(), key=lambda x: network.line_sort_key(x[0])):
+        for variant, filename in files.items():
+            update = diff_file(line, variant, filename, old_rev, new_rev)
+            if update:
+                updates.append(update)
+    return updates
+
+def diff_file(line, variant, filename, old_rev, new_rev=None):
+    """Diffs one timetable file between two revisions. Returns a FeedItem, or None if unchanged."""
+    try:
+        old = load_revision(filename, old_rev)
+    except (subprocess.CalledProcessError, json.JSONDecodeError, OSError) as e:
+        logging.warning(f"Could not load {filename} at {old_rev}: {e}")
+        return None
+    new = load_revision(filename, new_rev)
+    changes = diff_index(timetable.build_index(old), timetable.build_index(new))
+    if not changes:
+        logging.info(f"No timetable changes in {filename}")
+        return None
+    content_hash = hashlib.sha1(json.dumps(new, sort_keys=True).encode('utf-8')).hexdigest()
+    logging.info(f"{filename}: {len(changes)} station pair(s) changed")
+    return summarize_changes(line, variant, changes, content_hash)
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff timetable revisions and publish changes to the feed')
+    parser.add_argument('--old-rev', default='HEAD~1', help='Git revision to compare from (default: HEAD~1)')
+    parser.add_argument('--new-rev', help='Git revision to compare to (default: working tree)')
+    parser.add_argument('--publish', action='store_true', help='Add the change summaries to the RSS feed')
+    args = parser.parse_args()
+
+    import generate_metro_rss as gen
+    gen.setup_logging()
+
+    updates = diff_revisions(args.old_rev, args.new_rev)
+    for update in updates:
+        print(f"🚇 {update.feed_title}")
+        for line in update.description.splitlines():
+            print(f"   {line}")
+    if not updates:
+        print("✅ No timetable changes")
+        return 0
+
+    if args.publish:
+        existing_guids = gen.load_existing_feed_guids(gen.RSS_FILENAME) | gen.load_archived_guids()
+        if all(update.guid in existing_guids for update in updates):
+            print("✅ Timetable changes already published")
+            return 0
+        gen.generate_rss_feed(updates, existing_guids, gen.RSS_FILENAME)
+        print(f"📰 Published {len(updates)} timetable change item(s) to {gen.RSS_FILENAME}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,9 @@ import logging
 from datetime import datetime
 import argparse
 
+from profiling import add_profile_arguments, run_profiled
+from replay import resolve_url
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -134,7 +137,7 @@ def validate_feed_accessibility(url):
             'Accept': 'application/rss+xml, application/xml, text/xml'
         }
         
-        response = requests.get(url, headers=headers, timeout=15)
+        response = requests.get(resolve_url(url), headers=headers, timeout=15)
         
         print(f"📡 HTTP Status: {response.status_code}")
         print(f"📏 Content Length: {len(response.content)} bytes")
@@ -231,14 +234,7 @@ def validate_feed_content(file_path):
         print(f"❌ Content validation error: {e}")
         return False
 
-def main():
-    parser = argparse.ArgumentParser(description='Validate Metro RSS feeds')
-    parser.add_argument('--file', default='metro_feed.xml', help='RSS file to validate')
-    parser.add_argument('--url', help='RSS URL to check accessibility')
-    parser.add_argument('--skip-remote', action='store_true', help='Skip remote accessibility check')
-    
-    args = parser.parse_args()
-    
+def run_validation(args):
     print("🚇 Metro RSS Feed Validator")
     print("=" * 50)
     
@@ -280,5 +276,16 @@ def main():
         print("\n💥 Some validations failed!")
         return 1
 
+def main():
+    parser = argparse.ArgumentParser(description='Validate Metro RSS feeds')
+    parser.add_argument('--file', default='metro_feed.xml', help='RSS file to validate')
+    parser.add_argument('--url', help='RSS URL to check accessibility')
+    parser.add_argument('--skip-remote', action='store_true', help='Skip remote accessibility check')
+    add_profile_arguments(parser)
+    
+    args = parser.parse_args()
+    
+    return run_profiled(lambda: run_validation(args), args, 'validate_feeds')
+
 if __name__ == "__main__":
     sys.exit(main())